@@ -14,16 +14,23 @@ from flask import (
 )
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.base import BaseTrigger
+from datetime import timedelta
 import subprocess
+import threading
+import shlex
 import hashlib
 import logging
-import json
+import asyncio
+import aiohttp
 import sys
 import os
 
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, parent_dir)
-from quark_auto_save import Quark
+from quark_auto_save import Quark, StateStore, TASK_STATE_KEYS, poll_schedule, state_path, task_key
+from quark_mirror import DriveMirror
+from config_store import ConfigStore
 
 
 def get_app_ver():
@@ -42,6 +49,10 @@ PYTHON_PATH = "python3" if os.path.exists("/usr/bin/python3") else "python"
 SCRIPT_PATH = os.environ.get("SCRIPT_PATH", "./quark_auto_save.py")
 CONFIG_PATH = os.environ.get("CONFIG_PATH", "./config/quark_config.json")
 DEBUG = os.environ.get("DEBUG", False)
+DAEMON_MODE = os.environ.get("DAEMON_MODE", "").lower() == "true"
+MIRROR_PATH = state_path(CONFIG_PATH, "mirror.db")
+MIRROR_LISTING_TTL = int(os.environ.get("MIRROR_LISTING_TTL", 60))
+STATE_PATH = state_path(CONFIG_PATH, "state.db")
 
 app = Flask(__name__)
 app.config["APP_VERSION"] = get_app_ver()
@@ -69,16 +80,34 @@ def gen_md5(string):
 
 
 # 读取 JSON 文件内容
-def read_json():
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def read_json(config_store=None):
+    return (config_store or ConfigStore(CONFIG_PATH, indent=4)).read()
+
+
+# 将数据写入 JSON 文件：加锁原子写入，传入读取时的 config_store 则与期间其他进程的修改合并
+def write_json(data, config_store=None):
+    return (config_store or ConfigStore(CONFIG_PATH, indent=4)).write(data)
+
+
+# 读取配置并合并任务运行状态
+def read_json_with_state():
+    data = read_json()
+    if os.path.exists(STATE_PATH):
+        store = StateStore(STATE_PATH)
+        try:
+            store.apply(data.get("tasklist", []))
+        finally:
+            store.close()
     return data
 
 
-# 将数据写入 JSON 文件
-def write_json(data):
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False, sort_keys=False)
+# Quark 接口为异步实现，在独立的事件循环中调用
+def run_async(func):
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            return await func(session)
+
+    return asyncio.run(run())
 
 
 def is_login():
@@ -142,7 +171,7 @@ def index():
 def get_data():
     if not is_login():
         return redirect(url_for("login"))
-    data = read_json()
+    data = read_json_with_state()
     del data["webui"]
     return jsonify(data)
 
@@ -152,11 +181,37 @@ def get_data():
 def update():
     if not is_login():
         return "未登录"
-    data = read_json()
+    config_store = ConfigStore(CONFIG_PATH, indent=4)
+    data = read_json(config_store)
     webui = data["webui"]
+    user_emby = {
+        task_key(task): task["emby_id"]
+        for task in data.get("tasklist", [])
+        if task.get("emby_id")
+    }
     data = request.json
     data["webui"] = webui
-    write_json(data)
+    # 运行状态由脚本写入状态存储，配置文件只保存用户填写的内容
+    store = StateStore(STATE_PATH)
+    try:
+        states = store.states()
+        for index, task in enumerate(data.get("tasklist", [])):
+            key = task_key(task)
+            state = states.get(key, {})
+            if state.get("shareurl_ban") and not task.get("shareurl_ban"):
+                # 页面上清除了失效标记
+                store.clear(key, ("shareurl_ban", "shareurl_ban_count", "shareurl_ban_time"))
+            keep_emby = task.get("emby_id") and (
+                key in user_emby or task["emby_id"] != state.get("emby_id")
+            )
+            data["tasklist"][index] = {
+                field: value
+                for field, value in task.items()
+                if field not in TASK_STATE_KEYS or (field == "emby_id" and keep_emby)
+            }
+    finally:
+        store.close()
+    write_json(data, config_store)
     # 重新加载任务
     if reload_tasks():
         logging.info(f">>> 配置更新成功")
@@ -220,27 +275,169 @@ def get_savepath():
         return jsonify({"error": "未登录"})
     data = read_json()
     account = Quark(data["cookie"][0], 0)
-    if path := request.args.get("path"):
-        if path == "/":
-            fid = 0
-        elif get_fids := account.get_fids([path]):
+    if data.get("mirror", True):
+        # 近期获取过的目录从本地镜像读取，其余目录请求网盘并刷新镜像
+        account.mirror = DriveMirror(MIRROR_PATH)
+    path = request.args.get("path")
+    fid = request.args.get("fid", 0)
+
+    async def browse(session):
+        nonlocal fid
+        if path and path != "/":
+            get_fids = await account.get_fids(session, [path])
+            if not get_fids:
+                return []
             fid = get_fids[0]["fid"]
-        else:
-            return jsonify([])
-    else:
-        fid = request.args.get("fid", 0)
-    file_list = account.ls_dir(fid)
+        elif path == "/":
+            fid = 0
+        if account.mirror and account.mirror.listed_within(fid, MIRROR_LISTING_TTL):
+            return account.mirror.listing(fid)
+        return await account.ls_dir(session, fid, cached=False)
+
+    try:
+        file_list = run_async(browse)
+    finally:
+        if account.mirror:
+            account.mirror.close()
     return jsonify(file_list)
 
 
+# 在本地镜像中按文件名搜索
+@app.route("/search_files")
+def search_files():
+    if not is_login():
+        return jsonify({"error": "未登录"})
+    keyword = request.args.get("keyword", "").strip()
+    if not keyword or not os.path.exists(MIRROR_PATH):
+        return jsonify([])
+    mirror = DriveMirror(MIRROR_PATH)
+    try:
+        file_list = mirror.search(keyword, request.args.get("limit", 100, type=int))
+    finally:
+        mirror.close()
+    return jsonify(file_list)
+
+
+# 各任务的自适应轮询计划
+@app.route("/schedule")
+def get_schedule():
+    if not is_login():
+        return jsonify({"error": "未登录"})
+    data = read_json_with_state()
+    schedule = [
+        {"taskname": task["taskname"], **poll_schedule(task)}
+        for task in data.get("tasklist", [])
+    ]
+    return jsonify(schedule)
+
+
+# 在 CronTrigger 的每次触发时间之前提前触发，用于运行前预热
+class OffsetCronTrigger(BaseTrigger):
+    def __init__(self, trigger, minutes):
+        self.trigger = trigger
+        self.offset = timedelta(minutes=minutes)
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        next_fire_time = self.trigger.get_next_fire_time(
+            previous_fire_time + self.offset if previous_fire_time else None,
+            now + self.offset,
+        )
+        return next_fire_time - self.offset if next_fire_time else None
+
+    def __str__(self):
+        return f"{self.trigger} - {self.offset}"
+
+
 # 定时任务执行的函数
 def run_python(args):
     logging.info(f">>> 定时运行任务")
     os.system(f"{PYTHON_PATH} {args}")
 
 
+# 单独设置了 crontab 的任务：同一时刻触发的任务合并为一批，由一个进程执行。
+# 触发时按当前配置取出该定时规则下的任务，以 任务名称|分享链接 传给脚本，
+# Web 端以外（如 movie_list.py）对任务列表的修改无需重载即可生效
+BATCH_DELAY = 5
+pending_task_keys = set()
+pending_lock = threading.Lock()
+pending_timer = None
+# 当前已添加任务的定时规则
+scheduled_groups = set()
+
+
+# 按定时规则分组，未单独设置的任务跟随全局 crontab
+def task_groups(data):
+    groups = {}
+    for task in data.get("tasklist", []):
+        groups.setdefault(task.get("crontab") or data.get("crontab"), []).append(task_key(task))
+    return groups
+
+
+def task_args(task_keys):
+    return shlex.join([SCRIPT_PATH, CONFIG_PATH] + [arg for key in task_keys for arg in ("--task", key)])
+
+
+def group_task_keys(task_crontab):
+    data = read_json()
+    groups = task_groups(data)
+    if set(groups) != scheduled_groups:
+        # 定时规则有增减，重新添加任务
+        reload_tasks()
+    return groups.get(task_crontab, [])
+
+
+def run_all_tasks():
+    data = read_json()
+    if set(task_groups(data)) - {data.get("crontab")}:
+        # 期间有任务单独设置了定时规则，改为按规则分组运行
+        reload_tasks()
+        run_task_batch(data.get("crontab"))
+    else:
+        run_python(f"{SCRIPT_PATH} {CONFIG_PATH}")
+
+
+def run_task_batch(task_crontab):
+    global pending_timer
+    task_keys = group_task_keys(task_crontab)
+    with pending_lock:
+        pending_task_keys.update(task_keys)
+        if pending_timer is None:
+            pending_timer = threading.Timer(BATCH_DELAY, flush_task_batch)
+            pending_timer.start()
+
+
+def flush_task_batch():
+    global pending_timer
+    with pending_lock:
+        task_keys = sorted(pending_task_keys)
+        pending_task_keys.clear()
+        pending_timer = None
+    if task_keys:
+        run_python(task_args(task_keys))
+
+
+def run_task_warmup(task_crontab):
+    task_keys = group_task_keys(task_crontab)
+    if task_keys:
+        run_python(f"{task_args(task_keys)} --warmup")
+
+
+# 常驻模式：脚本自行按 crontab 调度，配置变动时自动重载
+daemon_process = None
+
+
+def start_daemon():
+    global daemon_process
+    if daemon_process is None or daemon_process.poll() is not None:
+        logging.info(f">>> 启动常驻进程")
+        daemon_process = subprocess.Popen(
+            [PYTHON_PATH, "-u", SCRIPT_PATH, CONFIG_PATH, "--daemon"]
+        )
+
+
 # 重新加载任务
 def reload_tasks():
+    global scheduled_groups
     # 读取数据
     data = read_json()
     # 添加新任务
@@ -250,12 +447,50 @@ def reload_tasks():
             scheduler.pause()  # 暂停调度器
         trigger = CronTrigger.from_crontab(crontab)
         scheduler.remove_all_jobs()
-        scheduler.add_job(
-            run_python,
-            trigger=trigger,
-            args=[f"{SCRIPT_PATH} {CONFIG_PATH}"],
-            id=SCRIPT_PATH,
-        )
+        groups = task_groups(data)
+        scheduled_groups = set(groups)
+        # 运行前预热的提前分钟数，常驻模式由脚本自行预热
+        warmup = int(data.get("warmup") or 0)
+        if DAEMON_MODE:
+            start_daemon()
+        elif list(groups) in ([], [crontab]):
+            scheduler.add_job(
+                run_all_tasks,
+                trigger=trigger,
+                id=SCRIPT_PATH,
+            )
+            if warmup:
+                scheduler.add_job(
+                    run_python,
+                    trigger=OffsetCronTrigger(trigger, warmup),
+                    args=[f"{SCRIPT_PATH} {CONFIG_PATH} --warmup"],
+                    id=f"{SCRIPT_PATH}:warmup",
+                )
+        else:
+            for task_crontab in groups:
+                scheduler.add_job(
+                    run_task_batch,
+                    trigger=CronTrigger.from_crontab(task_crontab),
+                    args=[task_crontab],
+                    id=f"{SCRIPT_PATH}:{task_crontab}",
+                )
+                if warmup:
+                    scheduler.add_job(
+                        run_task_warmup,
+                        trigger=OffsetCronTrigger(CronTrigger.from_crontab(task_crontab), warmup),
+                        args=[task_crontab],
+                        id=f"{SCRIPT_PATH}:{task_crontab}:warmup",
+                    )
+        # 回收站清理维护任务
+        if recycle_crontab := data.get("recycle_crontab"):
+            # 默认只清理本程序删除的文件，"recycle_purge": "all" 时清空整个回收站
+            purge_arg = "all" if data.get("recycle_purge") == "all" else ""
+            scheduler.add_job(
+                run_python,
+                trigger=CronTrigger.from_crontab(recycle_crontab),
+                args=[f"{SCRIPT_PATH} {CONFIG_PATH} --purge-recycle {purge_arg}".rstrip()],
+                id=f"{SCRIPT_PATH}:purge_recycle",
+            )
         if scheduler.state == 0:
             scheduler.start()
         elif scheduler.state == 2:
@@ -279,7 +514,8 @@ def init():
             os.makedirs(os.path.dirname(CONFIG_PATH))
         with open("quark_config.json", "rb") as src, open(CONFIG_PATH, "wb") as dest:
             dest.write(src.read())
-    data = read_json()
+    config_store = ConfigStore(CONFIG_PATH, indent=4)
+    data = read_json(config_store)
     # 默认管理账号
     if not data.get("webui"):
         data["webui"] = {
@@ -294,7 +530,7 @@ def init():
     # 默认定时规则
     if not data.get("crontab"):
         data["crontab"] = "0 8,18,20 * * *"
-    write_json(data)
+    write_json(data, config_store)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 配置文件的并发读写：文件锁、临时文件原子替换、写入时与其他进程的修改合并
+
+import os
+import copy
+import json
+import errno
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 下没有 fcntl，不加锁
+    fcntl = None
+
+_MISSING = object()
+
+
+def merge(base, ours, theirs):
+    # 三方合并：只有本方修改过的字段才覆盖文件中的当前值，双方都修改时以本方为准
+    if ours == base:
+        return theirs
+    if theirs == base or theirs is _MISSING:
+        return ours
+    if ours is _MISSING:
+        return _MISSING
+    if isinstance(base, dict) and isinstance(ours, dict) and isinstance(theirs, dict):
+        result = {}
+        for key in list(theirs) + [key for key in ours if key not in theirs]:
+            if key == "tasklist" and all(
+                isinstance(value, list) for value in (base.get(key), ours.get(key), theirs.get(key))
+            ):
+                value = merge_tasks(base[key], ours[key], theirs[key])
+            else:
+                value = merge(base.get(key, _MISSING), ours.get(key, _MISSING), theirs.get(key, _MISSING))
+            if value is not _MISSING:
+                result[key] = value
+        return result
+    return ours
+
+
+def merge_tasks(base, ours, theirs):
+    # 任务列表按任务名称逐个合并，保留对方新增的任务与各自修改的字段
+    def index(tasklist):
+        return {task.get("taskname"): task for task in tasklist if isinstance(task, dict)}
+
+    base_map, ours_map, theirs_map = index(base), index(ours), index(theirs)
+    if len(ours_map) != len(ours) or len(theirs_map) != len(theirs):
+        # 有重名任务时无法逐个对应，整体以本方为准
+        return ours
+    result = []
+    for name in list(theirs_map) + [name for name in ours_map if name not in theirs_map]:
+        task = merge(
+            base_map.get(name, _MISSING),
+            ours_map.get(name, _MISSING),
+            theirs_map.get(name, _MISSING),
+        )
+        if task is not _MISSING:
+            result.append(task)
+    return result
+
+
+class ConfigStore:
+    # read() 记录读到的内容作为合并基准，write() 在锁内重新读取文件，只写入本方修改过的字段
+    def __init__(self, path, indent=2):
+        self.path = path
+        self.indent = indent
+        self.base = None
+
+    @contextmanager
+    def lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def read(self):
+        with self.lock():
+            data = self._load()
+        self.base = copy.deepcopy(data)
+        return data
+
+    def _dump(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.path)}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(data, file, ensure_ascii=False, indent=self.indent)
+                file.flush()
+                os.fsync(file.fileno())
+            if os.path.exists(self.path):
+                shutil.copymode(self.path, tmp_path)
+            try:
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                if e.errno not in (errno.EBUSY, errno.EXDEV):
+                    raise
+                # 配置文件单独挂载（如 Docker 挂载单个文件）时无法替换，改为原地写入
+                with open(self.path, "w", encoding="utf-8") as file:
+                    json.dump(data, file, ensure_ascii=False, indent=self.indent)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def write(self, data):
+        # 返回实际写入的内容，其他进程的修改已合并在内
+        with self.lock():
+            if self.base is not None and os.path.exists(self.path):
+                data = merge(self.base, data, self._load())
+            self._dump(data)
+        self.base = copy.deepcopy(data)
+        return data
+
+    @contextmanager
+    def transaction(self):
+        # 读取、修改、写回在同一把锁内完成，内容未变化时不写入
+        with self.lock():
+            data = self._load()
+            original = copy.deepcopy(data)
+            yield data
+            if data != original:
+                self._dump(data)
+        self.base = copy.deepcopy(data)
@@ -1,86 +1,261 @@
-import json
+import os
+import sys
+import time
+import argparse
+import subprocess
+from config_store import ConfigStore
 
-# 读取现有的JSON配置文件
-def read_json_config(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+# 监听文件变化优先使用 inotify，未安装时定时轮询
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
 
-# 写入更新后的JSON配置文件
-def write_json_config(file_path, data):
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+ENCODINGS = ['utf-8-sig', 'gbk', 'gb18030']
+# 检测编码时读取的文件头长度
+ENCODING_SAMPLE_SIZE = 64 * 1024
+# 监听模式：轮询间隔、检测到变化后等待写入完成的时间（秒）
+WATCH_INTERVAL = 2
+WATCH_SETTLE = 1
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quark_auto_save.py')
 
-# 从txt文件读取影片信息
+# 根据文件开头的内容检测编码，只检测一次
+def detect_encoding(file_path, encodings=ENCODINGS):
+    with open(file_path, 'rb') as f:
+        sample = f.read(ENCODING_SAMPLE_SIZE)
+    if len(sample) == ENCODING_SAMPLE_SIZE and b'\n' in sample:
+        # 截掉末尾不完整的一行，避免多字节字符被截断
+        sample = sample[:sample.rindex(b'\n')]
+    for encoding in encodings:
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("无法使用支持的编码读取文件。请检查/root/quark/movie_list.txt 文件是否有乱码")
+
+# 解析一行影片信息：名称=链接=目录[=更新子目录]
+def parse_movie_line(line):
+    parts = line.strip().split('=')
+    if len(parts) < 3:
+        return None
+    return {
+        'taskname': parts[0],
+        'shareurl': parts[1],
+        'savepath': parts[2],
+        'update_subdir': parts[3] if len(parts) > 3 else None
+    }
+
+# 从txt文件逐行读取影片信息
 def read_movie_info(file_path):
-    encodings = ['utf-8', 'gbk', 'gb18030']
-    movie_info = []
-    
+    encoding = detect_encoding(file_path)
+    encodings = [encoding] + [e for e in ENCODINGS if e != encoding]
     for encoding in encodings:
+        movie_info = []
         try:
             with open(file_path, 'r', encoding=encoding) as f:
                 for line in f:
-                    parts = line.strip().split('=')
-                    if len(parts) >= 3:
-                        info = {
-                            'taskname': parts[0],
-                            'shareurl': parts[1],
-                            'savepath': parts[2],
-                            'update_subdir': parts[3] if len(parts) > 3 else None
-                        }
+                    info = parse_movie_line(line)
+                    if info:
                         movie_info.append(info)
-            return movie_info  # 如果成功读取，直接返回结果
+            return movie_info
         except UnicodeDecodeError:
-            continue  # 如果当前编码失败，尝试下一个编码
-    
+            continue  # 文件后部出现检测范围外的字符时，换下一个编码重新读取
     raise ValueError("无法使用支持的编码读取文件。请检查/root/quark/movie_list.txt 文件是否有乱码")
 
-# 更新JSON配置文件
+# 由影片信息生成任务，emby_id 属于运行状态，由转存脚本匹配后保存在状态存储中
+def build_task(movie):
+    task = {
+        'taskname': movie['taskname'],
+        'shareurl': movie['shareurl'],
+        'savepath': movie['savepath'],
+        'pattern': '',
+        'replace': '',
+        'enddate': '',
+        'ignore_extension': False,
+        'runweek': [1, 2, 3, 4, 5, 6, 7]
+    }
+    if movie['update_subdir']:
+        task['update_subdir'] = movie['update_subdir']
+    return task
+
+# 更新JSON配置文件，返回新增、更新、未变化的任务数
 def update_json_config(config, new_movies):
+    tasklist = config.setdefault('tasklist', [])
+    # 按任务名称匹配已有任务；分享链接索引只用于提示不同名称的任务共用同一链接
+    by_name = {}
+    by_url = {}
+    for t in tasklist:
+        by_name.setdefault(t['taskname'], t)
+        by_url.setdefault(t.get('shareurl'), t)
+    stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'changed': []}
     for movie in new_movies:
-        task = {
-            'taskname': movie['taskname'],
-            'shareurl': movie['shareurl'],
-            'savepath': movie['savepath'],
-            'pattern': '',
-            'replace': '',
-            'enddate': '',
-            'emby_id': '',
-            'ignore_extension': False,
-            'runweek': [1, 2, 3, 4, 5, 6, 7]
-        }
-        if movie['update_subdir']:
-            task['update_subdir'] = movie['update_subdir']
-        
-        # 检查是否已存在相同的taskname
-        existing_task = next((t for t in config['tasklist'] if t['taskname'] == movie['taskname']), None)
+        task = build_task(movie)
+        existing_task = by_name.get(movie['taskname'])
         if existing_task:
+            if all(existing_task.get(k) == v for k, v in task.items()):
+                stats['unchanged'] += 1
+                continue
             # 更新现有任务
             existing_task.update(task)
+            stats['updated'] += 1
         else:
             # 添加新任务
-            config['tasklist'].append(task)
+            same_url = by_url.get(task['shareurl'])
+            if same_url:
+                print(f"提示：《{task['taskname']}》与《{same_url['taskname']}》使用相同的分享链接")
+            existing_task = task
+            tasklist.append(task)
+            by_name[task['taskname']] = task
+            stats['added'] += 1
+        stats['changed'].append(existing_task)
+        by_url.setdefault(task['shareurl'], existing_task)
+    return stats
+
+# 任务的稳定标识，与转存脚本 --task 参数的格式一致，不受任务在列表中的位置影响
+def task_key(task):
+    return f"{task['taskname']}|{task['shareurl']}"
+
+# 导入影片信息，返回统计与新增、更新的任务标识
+def import_movies(json_file_path, new_movies):
+    # 在配置文件锁内读取、更新并原子写回，可与转存脚本、Web 端同时运行；没有变化时不写入
+    with ConfigStore(json_file_path).transaction() as config:
+        stats = update_json_config(config, new_movies)
+    print(f"新增 {stats['added']} 个，更新 {stats['updated']} 个，未变化 {stats['unchanged']} 个")
+    return stats, list(dict.fromkeys(task_key(t) for t in stats['changed']))
+
+def movie_key(movie):
+    return (movie['taskname'], movie['shareurl'], movie['savepath'], movie['update_subdir'])
+
+class LinksTail:
+    # 跟踪影片信息文件：追加内容时只读取新增的完整行，文件被改写时重新读取全文，找出此前没有的行
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.encoding = None
+        self.offset = 0
+        self.tail = b''
+        self.seen = set()
+
+    def signature(self):
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def decode(self, data):
+        encodings = [self.encoding] + [e for e in ENCODINGS if e != self.encoding]
+        for encoding in encodings:
+            try:
+                text = data.decode(encoding)
+                self.encoding = encoding
+                return text
+            except UnicodeDecodeError:
+                continue
+        raise ValueError("无法使用支持的编码读取文件。请检查/root/quark/movie_list.txt 文件是否有乱码")
+
+    def consume(self, data):
+        # 只处理以换行结束的完整行，未写完的行留到下次
+        end = data.rfind(b'\n') + 1
+        movies = [m for m in map(parse_movie_line, self.decode(data[:end]).splitlines()) if m]
+        self.offset += end
+        self.tail = (self.tail + data[:end])[-256:]
+        return movies
+
+    def scan(self):
+        self.encoding = detect_encoding(self.file_path)
+        self.offset = 0
+        self.tail = b''
+        with open(self.file_path, 'rb') as f:
+            movies = self.consume(f.read())
+        changed = [m for m in movies if movie_key(m) not in self.seen]
+        self.seen = {movie_key(m) for m in movies}
+        return changed
+
+    def read_new(self):
+        # 尚未成功读取过（如启动时文件不存在）时读取全文
+        if self.encoding and os.path.getsize(self.file_path) >= self.offset:
+            with open(self.file_path, 'rb') as f:
+                f.seek(self.offset - len(self.tail))
+                # 已读取部分的末尾未变，说明只是追加了内容
+                if f.read(len(self.tail)) == self.tail:
+                    movies = [m for m in self.consume(f.read()) if movie_key(m) not in self.seen]
+                    self.seen.update(movie_key(m) for m in movies)
+                    return movies
+        return self.scan()
+
+# 立即运行指定的任务：按任务标识指定，期间其他进程增删任务也不会运行错；不受自适应轮询限制
+def run_tasks(json_file_path, task_keys):
+    command = [sys.executable, SCRIPT_PATH, json_file_path, '--force']
+    for key in task_keys:
+        command.append(f'--task={key}')
+    print(f"运行任务: {', '.join(key.split('|')[0] for key in task_keys)}")
+    subprocess.run(command)
+
+# 监听模式：影片信息文件新增或修改的行立即导入，并只运行这些任务
+def watch(json_file_path, txt_file_path, interval=WATCH_INTERVAL):
+    tail = LinksTail(txt_file_path)
+    try:
+        import_movies(json_file_path, tail.scan())
+    except Exception as e:
+        # 启动时文件不存在或读取失败，继续监听，文件出现或修改后再导入
+        print(f"发生错误：{str(e)}")
+    inotify = None
+    if INotify:
+        inotify = INotify()
+        inotify.add_watch(
+            os.path.dirname(os.path.abspath(txt_file_path)),
+            flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.MODIFY,
+        )
+    print(f"正在监听 {txt_file_path}（{'inotify' if inotify else '轮询'}）")
+    signature = tail.signature()
+    while True:
+        if inotify:
+            inotify.read(timeout=interval * 1000)
+        else:
+            time.sleep(interval)
+        if tail.signature() == signature:
+            continue
+        # 等待编辑器写入完成
+        time.sleep(WATCH_SETTLE)
+        signature = tail.signature()
+        if signature is None:
+            continue
+        try:
+            movies = tail.read_new()
+            if not movies:
+                continue
+            _, task_keys = import_movies(json_file_path, movies)
+            if task_keys:
+                run_tasks(json_file_path, task_keys)
+        except Exception as e:
+            print(f"发生错误：{str(e)}")
 
 # 主函数
 def main():
-    json_file_path = 'quark_config.json'
-    txt_file_path = 'movie_links.txt'
+    parser = argparse.ArgumentParser(description="从影片信息文件导入转存任务")
+    parser.add_argument("--config", default="quark_config.json", help="配置文件路径")
+    parser.add_argument("--links", default="movie_links.txt", help="影片信息文件路径")
+    parser.add_argument("--watch", action="store_true", help="监听影片信息文件，新增或修改的行立即导入并运行")
+    args = parser.parse_args()
+    json_file_path = args.config
+    txt_file_path = args.links
 
-    try:
-        # 读取现有的JSON配置
-        config = read_json_config(json_file_path)
+    if args.watch:
+        watch(json_file_path, txt_file_path)
+        return
 
+    try:
         # 读取txt文件中的影片信息
         new_movies = read_movie_info(txt_file_path)
 
-        # 更新JSON配置
-        update_json_config(config, new_movies)
-
-        # 写入更新后的JSON配置
-        write_json_config(json_file_path, config)
-
-        print("配置文件已成功更新。")
+        stats, _ = import_movies(json_file_path, new_movies)
+        if stats['added'] or stats['updated']:
+            print("配置文件已成功更新。")
+        else:
+            print("配置文件没有变化。")
     except Exception as e:
         print(f"发生错误：{str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,21 +1,30 @@
 #!/usr/bin/env python3
 # _*_ coding:utf-8 _*_
+import asyncio
 import base64
+import contextvars
 import hashlib
 import hmac
 import json
 import os
+import random
 import re
 import threading
 import time
 import urllib.parse
 import smtplib
+import tempfile
 from email.mime.text import MIMEText
 from email.header import Header
 from email.utils import formataddr
 
 import requests
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
 # 原先的 print 函数和主线程的锁
 _print = print
 mutex = threading.Lock()
@@ -30,10 +39,45 @@ def print(text, *args, **kw):
         _print(text, *args, **kw)
 
 
+class ContextConfig:
+    """
+    推送配置：默认使用全局配置，bind() 为当前 contextvars 上下文指定独立的配置，
+    多个配置在同一进程中并发推送时各自的渠道与密钥互不干扰。
+    """
+
+    def __init__(self, default: dict):
+        self._var = contextvars.ContextVar("push_config")
+        self._default = default
+
+    def current(self) -> dict:
+        return self._var.get(self._default)
+
+    def bind(self, value: dict) -> dict:
+        self._var.set(value)
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+    def __getitem__(self, key):
+        return self.current()[key]
+
+    def __setitem__(self, key, value):
+        self.current()[key] = value
+
+    def __contains__(self, key):
+        return key in self.current()
+
+    def __iter__(self):
+        return iter(self.current())
+
+
 # 通知服务
 # fmt: off
-push_config = {
+push_config = ContextConfig({
     'HITOKOTO': True,                  # 启用一言（随机句子）
+    'HITOKOTO_POOL': '',                # 一言缓存池文件路径，默认放在系统临时目录
+    'NOTIFY_TIMEOUT': 15,               # 异步推送时每个渠道的超时时间（秒）
 
     'BARK_PUSH': '',                    # bark IP 或设备码，例：https://api.day.app/DxHcxxxxxRxxxxxxcm/
     'BARK_ARCHIVE': '',                 # bark 推送是否存档
@@ -117,7 +161,7 @@ push_config = {
     'WEBHOOK_HEADERS': '',              # 自定义通知 请求头
     'WEBHOOK_METHOD': '',               # 自定义通知 请求方法
     'WEBHOOK_CONTENT_TYPE': ''          # 自定义通知 content-type
-}
+})
 # fmt: on
 
 for k in push_config:
@@ -126,6 +170,47 @@ for k in push_config:
         push_config[k] = v
 
 
+def notify_timeout() -> float:
+    return float(push_config.get("NOTIFY_TIMEOUT") or 15)
+
+
+def request_sync(req: dict, timeout: float = None) -> dict:
+    """
+    使用 requests 发送渠道请求，返回 JSON 响应；raw 请求返回状态码与响应文本。
+    """
+    proxies = {"http": req["proxy"], "https": req["proxy"]} if req.get("proxy") else None
+    response = requests.request(
+        req["method"],
+        req["url"],
+        headers=req.get("headers"),
+        data=req.get("data"),
+        params=req.get("params"),
+        proxies=proxies,
+        timeout=timeout or notify_timeout(),
+    )
+    if req.get("raw"):
+        return {"status": response.status_code, "text": response.text}
+    return response.json()
+
+
+async def request_async(session, req: dict, timeout: float) -> dict:
+    """
+    使用 aiohttp 发送渠道请求，返回 JSON 响应；raw 请求返回状态码与响应文本。
+    """
+    async with session.request(
+        req["method"],
+        req["url"],
+        headers=req.get("headers"),
+        data=req.get("data"),
+        params=req.get("params"),
+        proxy=req.get("proxy"),
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as response:
+        if req.get("raw"):
+            return {"status": response.status, "text": await response.text()}
+        return await response.json(content_type=None)
+
+
 def bark(title: str, content: str) -> None:
     """
     使用 bark 推送消息。
@@ -135,6 +220,16 @@ def bark(title: str, content: str) -> None:
         return
     print("bark 服务启动")
 
+    req = bark_request(title, content)
+    response = request_sync(req)
+
+    if req["check"](response):
+        print("bark 推送成功！")
+    else:
+        print("bark 推送失败！")
+
+
+def bark_request(title: str, content: str) -> dict:
     if push_config.get("BARK_PUSH").startswith("http"):
         url = f'{push_config.get("BARK_PUSH")}'
     else:
@@ -161,14 +256,13 @@ def bark(title: str, content: str) -> None:
     ):
         data[bark_params.get(pair[0])] = pair[1]
     headers = {"Content-Type": "application/json;charset=utf-8"}
-    response = requests.post(
-        url=url, data=json.dumps(data), headers=headers, timeout=15
-    ).json()
-
-    if response["code"] == 200:
-        print("bark 推送成功！")
-    else:
-        print("bark 推送失败！")
+    return {
+        "method": "POST",
+        "url": url,
+        "data": json.dumps(data),
+        "headers": headers,
+        "check": lambda response: response["code"] == 200,
+    }
 
 
 def console(title: str, content: str) -> None:
@@ -187,6 +281,16 @@ def dingding_bot(title: str, content: str) -> None:
         return
     print("钉钉机器人 服务启动")
 
+    req = dingding_bot_request(title, content)
+    response = request_sync(req)
+
+    if req["check"](response):
+        print("钉钉机器人 推送成功！")
+    else:
+        print("钉钉机器人 推送失败！")
+
+
+def dingding_bot_request(title: str, content: str) -> dict:
     timestamp = str(round(time.time() * 1000))
     secret_enc = push_config.get("DD_BOT_SECRET").encode("utf-8")
     string_to_sign = "{}\n{}".format(timestamp, push_config.get("DD_BOT_SECRET"))
@@ -198,14 +302,13 @@ def dingding_bot(title: str, content: str) -> None:
     url = f'https://oapi.dingtalk.com/robot/send?access_token={push_config.get("DD_BOT_TOKEN")}&timestamp={timestamp}&sign={sign}'
     headers = {"Content-Type": "application/json;charset=utf-8"}
     data = {"msgtype": "text", "text": {"content": f"{title}\n\n{content}"}}
-    response = requests.post(
-        url=url, data=json.dumps(data), headers=headers, timeout=15
-    ).json()
-
-    if not response["errcode"]:
-        print("钉钉机器人 推送成功！")
-    else:
-        print("钉钉机器人 推送失败！")
+    return {
+        "method": "POST",
+        "url": url,
+        "data": json.dumps(data),
+        "headers": headers,
+        "check": lambda response: not response["errcode"],
+    }
 
 
 def feishu_bot(title: str, content: str) -> None:
@@ -217,16 +320,27 @@ def feishu_bot(title: str, content: str) -> None:
         return
     print("飞书 服务启动")
 
-    url = f'https://open.feishu.cn/open-apis/bot/v2/hook/{push_config.get("FSKEY")}'
-    data = {"msg_type": "text", "content": {"text": f"{title}\n\n{content}"}}
-    response = requests.post(url, data=json.dumps(data)).json()
+    req = feishu_bot_request(title, content)
+    response = request_sync(req)
 
-    if response.get("StatusCode") == 0 or response.get("code") == 0:
+    if req["check"](response):
         print("飞书 推送成功！")
     else:
         print("飞书 推送失败！错误信息如下：\n", response)
 
 
+def feishu_bot_request(title: str, content: str) -> dict:
+    url = f'https://open.feishu.cn/open-apis/bot/v2/hook/{push_config.get("FSKEY")}'
+    data = {"msg_type": "text", "content": {"text": f"{title}\n\n{content}"}}
+    return {
+        "method": "POST",
+        "url": url,
+        "data": json.dumps(data),
+        "check": lambda response: response.get("StatusCode") == 0
+        or response.get("code") == 0,
+    }
+
+
 def go_cqhttp(title: str, content: str) -> None:
     """
     使用 go_cqhttp 推送消息。
@@ -236,15 +350,25 @@ def go_cqhttp(title: str, content: str) -> None:
         return
     print("go-cqhttp 服务启动")
 
-    url = f'{push_config.get("GOBOT_URL")}?access_token={push_config.get("GOBOT_TOKEN")}&{push_config.get("GOBOT_QQ")}&message=标题:{title}\n内容:{content}'
-    response = requests.get(url).json()
+    req = go_cqhttp_request(title, content)
+    response = request_sync(req)
 
-    if response["status"] == "ok":
+    if req["check"](response):
         print("go-cqhttp 推送成功！")
     else:
         print("go-cqhttp 推送失败！")
 
 
+def go_cqhttp_request(title: str, content: str) -> dict:
+    message = urllib.parse.quote(f"标题:{title}\n内容:{content}")
+    url = f'{push_config.get("GOBOT_URL")}?access_token={push_config.get("GOBOT_TOKEN")}&{push_config.get("GOBOT_QQ")}&message={message}'
+    return {
+        "method": "GET",
+        "url": url,
+        "check": lambda response: response["status"] == "ok",
+    }
+
+
 def gotify(title: str, content: str) -> None:
     """
     使用 gotify 推送消息。
@@ -254,18 +378,28 @@ def gotify(title: str, content: str) -> None:
         return
     print("gotify 服务启动")
 
+    req = gotify_request(title, content)
+    response = request_sync(req)
+
+    if req["check"](response):
+        print("gotify 推送成功！")
+    else:
+        print("gotify 推送失败！")
+
+
+def gotify_request(title: str, content: str) -> dict:
     url = f'{push_config.get("GOTIFY_URL")}/message?token={push_config.get("GOTIFY_TOKEN")}'
     data = {
         "title": title,
         "message": content,
-        "priority": push_config.get("GOTIFY_PRIORITY"),
+        "priority": str(push_config.get("GOTIFY_PRIORITY")),
+    }
+    return {
+        "method": "POST",
+        "url": url,
+        "data": data,
+        "check": lambda response: response.get("id"),
     }
-    response = requests.post(url, data=data).json()
-
-    if response.get("id"):
-        print("gotify 推送成功！")
-    else:
-        print("gotify 推送失败！")
 
 
 def iGot(title: str, content: str) -> None:
@@ -277,15 +411,26 @@ def iGot(title: str, content: str) -> None:
         return
     print("iGot 服务启动")
 
-    url = f'https://push.hellyw.com/{push_config.get("IGOT_PUSH_KEY")}'
-    data = {"title": title, "content": content}
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    response = requests.post(url, data=data, headers=headers).json()
+    req = iGot_request(title, content)
+    response = request_sync(req)
 
-    if response["ret"] == 0:
+    if req["check"](response):
         print("iGot 推送成功！")
     else:
-        print(f'iGot 推送失败！{response["errMsg"]}')
+        print(f'iGot 推送失败！{response.get("errMsg")}')
+
+
+def iGot_request(title: str, content: str) -> dict:
+    url = f'https://push.hellyw.com/{push_config.get("IGOT_PUSH_KEY")}'
+    data = {"title": title, "content": content}
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    return {
+        "method": "POST",
+        "url": url,
+        "data": data,
+        "headers": headers,
+        "check": lambda response: response["ret"] == 0,
+    }
 
 
 def serverJ(title: str, content: str) -> None:
@@ -297,17 +442,28 @@ def serverJ(title: str, content: str) -> None:
         return
     print("serverJ 服务启动")
 
+    req = serverJ_request(title, content)
+    response = request_sync(req)
+
+    if req["check"](response):
+        print("serverJ 推送成功！")
+    else:
+        print(f'serverJ 推送失败！错误码：{response["message"]}')
+
+
+def serverJ_request(title: str, content: str) -> dict:
     data = {"text": title, "desp": content.replace("\n", "\n\n")}
     if push_config.get("PUSH_KEY").find("SCT") != -1:
         url = f'https://sctapi.ftqq.com/{push_config.get("PUSH_KEY")}.send'
     else:
         url = f'https://sc.ftqq.com/{push_config.get("PUSH_KEY")}.send'
-    response = requests.post(url, data=data).json()
-
-    if response.get("errno") == 0 or response.get("code") == 0:
-        print("serverJ 推送成功！")
-    else:
-        print(f'serverJ 推送失败！错误码：{response["message"]}')
+    return {
+        "method": "POST",
+        "url": url,
+        "data": data,
+        "check": lambda response: response.get("errno") == 0
+        or response.get("code") == 0,
+    }
 
 
 def pushdeer(title: str, content: str) -> None:
@@ -318,6 +474,17 @@ def pushdeer(title: str, content: str) -> None:
         print("PushDeer 服务的 DEER_KEY 未设置!!\n取消推送")
         return
     print("PushDeer 服务启动")
+
+    req = pushdeer_request(title, content)
+    response = request_sync(req)
+
+    if req["check"](response):
+        print("PushDeer 推送成功！")
+    else:
+        print("PushDeer 推送失败！错误信息：", response)
+
+
+def pushdeer_request(title: str, content: str) -> dict:
     data = {
         "text": title,
         "desp": content,
@@ -327,13 +494,12 @@ def pushdeer(title: str, content: str) -> None:
     url = "https://api2.pushdeer.com/message/push"
     if push_config.get("DEER_URL"):
         url = push_config.get("DEER_URL")
-
-    response = requests.post(url, data=data).json()
-
-    if len(response.get("content").get("result")) > 0:
-        print("PushDeer 推送成功！")
-    else:
-        print("PushDeer 推送失败！错误信息：", response)
+    return {
+        "method": "POST",
+        "url": url,
+        "data": data,
+        "check": lambda response: len((response.get("content") or {}).get("result") or []) > 0,
+    }
 
 
 def chat(title: str, content: str) -> None:
@@ -344,16 +510,30 @@ def chat(title: str, content: str) -> None:
         print("chat 服务的 CHAT_URL或CHAT_TOKEN 未设置!!\n取消推送")
         return
     print("chat 服务启动")
-    data = "payload=" + json.dumps({"text": title + "\n" + content})
-    url = push_config.get("CHAT_URL") + push_config.get("CHAT_TOKEN")
-    response = requests.post(url, data=data)
 
-    if response.status_code == 200:
+    req = chat_request(title, content)
+    response = request_sync(req)
+
+    if req["check"](response):
         print("Chat 推送成功！")
     else:
         print("Chat 推送失败！错误信息：", response)
 
 
+def chat_request(title: str, content: str) -> dict:
+    data = "payload=" + json.dumps({"text": title + "\n" + content})
+    url = push_config.get("CHAT_URL") + push_config.get("CHAT_TOKEN")
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    return {
+        "method": "POST",
+        "url": url,
+        "data": data,
+        "headers": headers,
+        "raw": True,
+        "check": lambda response: response["status"] == 200,
+    }
+
+
 def pushplus_bot(title: str, content: str) -> None:
     """
     通过 push+ 推送消息。
@@ -363,32 +543,40 @@ def pushplus_bot(title: str, content: str) -> None:
         return
     print("PUSHPLUS 服务启动")
 
-    url = "http://www.pushplus.plus/send"
-    data = {
-        "token": push_config.get("PUSH_PLUS_TOKEN"),
-        "title": title,
-        "content": content,
-        "topic": push_config.get("PUSH_PLUS_USER"),
-    }
-    body = json.dumps(data).encode(encoding="utf-8")
-    headers = {"Content-Type": "application/json"}
-    response = requests.post(url=url, data=body, headers=headers).json()
+    req = pushplus_bot_request(title, content)
+    response = request_sync(req)
 
-    if response["code"] == 200:
+    if req["check"](response):
         print("PUSHPLUS 推送成功！")
 
     else:
-        url_old = "http://pushplus.hxtrip.com/send"
-        headers["Accept"] = "application/json"
-        response = requests.post(url=url_old, data=body, headers=headers).json()
+        req["url"] = "http://pushplus.hxtrip.com/send"
+        req["headers"]["Accept"] = "application/json"
+        response = request_sync(req)
 
-        if response["code"] == 200:
+        if req["check"](response):
             print("PUSHPLUS(hxtrip) 推送成功！")
 
         else:
             print("PUSHPLUS 推送失败！")
 
 
+def pushplus_bot_request(title: str, content: str) -> dict:
+    data = {
+        "token": push_config.get("PUSH_PLUS_TOKEN"),
+        "title": title,
+        "content": content,
+        "topic": push_config.get("PUSH_PLUS_USER"),
+    }
+    return {
+        "method": "POST",
+        "url": "http://www.pushplus.plus/send",
+        "data": json.dumps(data).encode(encoding="utf-8"),
+        "headers": {"Content-Type": "application/json"},
+        "check": lambda response: response["code"] == 200,
+    }
+
+
 def weplus_bot(title: str, content: str) -> None:
     """
     通过 微加机器人 推送消息。
@@ -398,11 +586,20 @@ def weplus_bot(title: str, content: str) -> None:
         return
     print("微加机器人 服务启动")
 
+    req = weplus_bot_request(title, content)
+    response = request_sync(req)
+
+    if req["check"](response):
+        print("微加机器人 推送成功！")
+    else:
+        print("微加机器人 推送失败！")
+
+
+def weplus_bot_request(title: str, content: str) -> dict:
     template = "txt"
     if len(content) > 800:
         template = "html"
 
-    url = "https://www.weplusbot.com/send"
     data = {
         "token": push_config.get("WE_PLUS_BOT_TOKEN"),
         "title": title,
@@ -411,14 +608,13 @@ def weplus_bot(title: str, content: str) -> None:
         "receiver": push_config.get("WE_PLUS_BOT_RECEIVER"),
         "version": push_config.get("WE_PLUS_BOT_VERSION"),
     }
-    body = json.dumps(data).encode(encoding="utf-8")
-    headers = {"Content-Type": "application/json"}
-    response = requests.post(url=url, data=body, headers=headers).json()
-
-    if response["code"] == 200:
-        print("微加机器人 推送成功！")
-    else:
-        print("微加机器人 推送失败！")
+    return {
+        "method": "POST",
+        "url": "https://www.weplusbot.com/send",
+        "data": json.dumps(data).encode(encoding="utf-8"),
+        "headers": {"Content-Type": "application/json"},
+        "check": lambda response: response["code"] == 200,
+    }
 
 
 def qmsg_bot(title: str, content: str) -> None:
@@ -430,14 +626,24 @@ def qmsg_bot(title: str, content: str) -> None:
         return
     print("qmsg 服务启动")
 
-    url = f'https://qmsg.zendee.cn/{push_config.get("QMSG_TYPE")}/{push_config.get("QMSG_KEY")}'
-    payload = {"msg": f'{title}\n\n{content.replace("----", "-")}'.encode("utf-8")}
-    response = requests.post(url=url, params=payload).json()
+    req = qmsg_bot_request(title, content)
+    response = request_sync(req)
 
-    if response["code"] == 0:
+    if req["check"](response):
         print("qmsg 推送成功！")
     else:
-        print(f'qmsg 推送失败！{response["reason"]}')
+        print(f'qmsg 推送失败！{response.get("reason")}')
+
+
+def qmsg_bot_request(title: str, content: str) -> dict:
+    url = f'https://qmsg.zendee.cn/{push_config.get("QMSG_TYPE")}/{push_config.get("QMSG_KEY")}'
+    payload = {"msg": f'{title}\n\n{content.replace("----", "-")}'}
+    return {
+        "method": "POST",
+        "url": url,
+        "params": payload,
+        "check": lambda response: response["code"] == 0,
+    }
 
 
 def wecom_app(title: str, content: str) -> None:
@@ -447,12 +653,23 @@ def wecom_app(title: str, content: str) -> None:
     if not push_config.get("QYWX_AM"):
         print("QYWX_AM 未设置!!\n取消推送")
         return
-    QYWX_AM_AY = re.split(",", push_config.get("QYWX_AM"))
-    if 4 < len(QYWX_AM_AY) > 5:
-        print("QYWX_AM 设置错误!!\n取消推送")
-        return
     print("企业微信 APP 服务启动")
 
+    try:
+        wecom_app_send(title, content)
+        print("企业微信推送成功！")
+    except Exception as e:
+        print("企业微信推送失败！错误信息如下：\n", e)
+
+
+def wecom_app_send(title: str, content: str) -> None:
+    """
+    发送企业微信 APP 消息（先获取 access_token），失败时抛出异常。
+    """
+    QYWX_AM_AY = re.split(",", push_config.get("QYWX_AM"))
+    if not 4 <= len(QYWX_AM_AY) <= 5:
+        raise ValueError("QYWX_AM 设置错误")
+
     corpid = QYWX_AM_AY[0]
     corpsecret = QYWX_AM_AY[1]
     touser = QYWX_AM_AY[2]
@@ -469,10 +686,8 @@ def wecom_app(title: str, content: str) -> None:
     else:
         response = wx.send_mpnews(title, content, media_id, touser)
 
-    if response == "ok":
-        print("企业微信推送成功！")
-    else:
-        print("企业微信推送失败！错误信息如下：\n", response)
+    if response != "ok":
+        raise RuntimeError(response)
 
 
 class WeCom:
@@ -490,7 +705,7 @@ class WeCom:
             "corpid": self.CORPID,
             "corpsecret": self.CORPSECRET,
         }
-        req = requests.post(url, params=values)
+        req = requests.post(url, params=values, timeout=notify_timeout())
         data = json.loads(req.text)
         return data["access_token"]
 
@@ -506,7 +721,7 @@ class WeCom:
             "safe": "0",
         }
         send_msges = bytes(json.dumps(send_values), "utf-8")
-        respone = requests.post(send_url, send_msges)
+        respone = requests.post(send_url, send_msges, timeout=notify_timeout())
         respone = respone.json()
         return respone["errmsg"]
 
@@ -532,7 +747,7 @@ class WeCom:
             },
         }
         send_msges = bytes(json.dumps(send_values), "utf-8")
-        respone = requests.post(send_url, send_msges)
+        respone = requests.post(send_url, send_msges, timeout=notify_timeout())
         respone = respone.json()
         return respone["errmsg"]
 
@@ -546,6 +761,16 @@ def wecom_bot(title: str, content: str) -> None:
         return
     print("企业微信机器人服务启动")
 
+    req = wecom_bot_request(title, content)
+    response = request_sync(req)
+
+    if req["check"](response):
+        print("企业微信机器人推送成功！")
+    else:
+        print("企业微信机器人推送失败！")
+
+
+def wecom_bot_request(title: str, content: str) -> dict:
     origin = "https://qyapi.weixin.qq.com"
     if push_config.get("QYWX_ORIGIN"):
         origin = push_config.get("QYWX_ORIGIN")
@@ -553,14 +778,13 @@ def wecom_bot(title: str, content: str) -> None:
     url = f"{origin}/cgi-bin/webhook/send?key={push_config.get('QYWX_KEY')}"
     headers = {"Content-Type": "application/json;charset=utf-8"}
     data = {"msgtype": "text", "text": {"content": f"{title}\n\n{content}"}}
-    response = requests.post(
-        url=url, data=json.dumps(data), headers=headers, timeout=15
-    ).json()
-
-    if response["errcode"] == 0:
-        print("企业微信机器人推送成功！")
-    else:
-        print("企业微信机器人推送失败！")
+    return {
+        "method": "POST",
+        "url": url,
+        "data": json.dumps(data),
+        "headers": headers,
+        "check": lambda response: response["errcode"] == 0,
+    }
 
 
 def telegram_bot(title: str, content: str) -> None:
@@ -572,6 +796,16 @@ def telegram_bot(title: str, content: str) -> None:
         return
     print("tg 服务启动")
 
+    req = telegram_bot_request(title, content)
+    response = request_sync(req)
+
+    if req["check"](response):
+        print("tg 推送成功！")
+    else:
+        print("tg 推送失败！")
+
+
+def telegram_bot_request(title: str, content: str) -> dict:
     if push_config.get("TG_API_HOST"):
         url = f"{push_config.get('TG_API_HOST')}/bot{push_config.get('TG_BOT_TOKEN')}/sendMessage"
     else:
@@ -584,7 +818,7 @@ def telegram_bot(title: str, content: str) -> None:
         "text": f"{title}\n\n{content}",
         "disable_web_page_preview": "true",
     }
-    proxies = None
+    proxy = None
     if push_config.get("TG_PROXY_HOST") and push_config.get("TG_PROXY_PORT"):
         if push_config.get("TG_PROXY_AUTH") is not None and "@" not in push_config.get(
             "TG_PROXY_HOST"
@@ -594,18 +828,17 @@ def telegram_bot(title: str, content: str) -> None:
                 + "@"
                 + push_config.get("TG_PROXY_HOST")
             )
-        proxyStr = "http://{}:{}".format(
+        proxy = "http://{}:{}".format(
             push_config.get("TG_PROXY_HOST"), push_config.get("TG_PROXY_PORT")
         )
-        proxies = {"http": proxyStr, "https": proxyStr}
-    response = requests.post(
-        url=url, headers=headers, params=payload, proxies=proxies
-    ).json()
-
-    if response["ok"]:
-        print("tg 推送成功！")
-    else:
-        print("tg 推送失败！")
+    return {
+        "method": "POST",
+        "url": url,
+        "headers": headers,
+        "data": payload,
+        "proxy": proxy,
+        "check": lambda response: response["ok"],
+    }
 
 
 def aibotk(title: str, content: str) -> None:
@@ -623,6 +856,16 @@ def aibotk(title: str, content: str) -> None:
         return
     print("智能微秘书 服务启动")
 
+    req = aibotk_request(title, content)
+    response = request_sync(req)
+    print(response)
+    if req["check"](response):
+        print("智能微秘书 推送成功！")
+    else:
+        print(f'智能微秘书 推送失败！{response.get("error")}')
+
+
+def aibotk_request(title: str, content: str) -> dict:
     if push_config.get("AIBOTK_TYPE") == "room":
         url = "https://api-bot.aibotk.com/openapi/v1/chat/room"
         data = {
@@ -637,14 +880,13 @@ def aibotk(title: str, content: str) -> None:
             "name": push_config.get("AIBOTK_NAME"),
             "message": {"type": 1, "content": f"【青龙快讯】\n\n{title}\n{content}"},
         }
-    body = json.dumps(data).encode(encoding="utf-8")
-    headers = {"Content-Type": "application/json"}
-    response = requests.post(url=url, data=body, headers=headers).json()
-    print(response)
-    if response["code"] == 0:
-        print("智能微秘书 推送成功！")
-    else:
-        print(f'智能微秘书 推送失败！{response["error"]}')
+    return {
+        "method": "POST",
+        "url": url,
+        "data": json.dumps(data).encode(encoding="utf-8"),
+        "headers": {"Content-Type": "application/json"},
+        "check": lambda response: response["code"] == 0,
+    }
 
 
 def smtp(title: str, content: str) -> None:
@@ -664,6 +906,17 @@ def smtp(title: str, content: str) -> None:
         return
     print("SMTP 邮件 服务启动")
 
+    try:
+        smtp_send(title, content)
+        print("SMTP 邮件 推送成功！")
+    except Exception as e:
+        print(f"SMTP 邮件 推送失败！{e}")
+
+
+def smtp_send(title: str, content: str) -> None:
+    """
+    发送邮件，连接与读写均有超时，失败时抛出异常。
+    """
     message = MIMEText(content, "plain", "utf-8")
     message["From"] = formataddr(
         (
@@ -679,12 +932,8 @@ def smtp(title: str, content: str) -> None:
     )
     message["Subject"] = Header(title, "utf-8")
 
-    try:
-        smtp_server = (
-            smtplib.SMTP_SSL(push_config.get("SMTP_SERVER"))
-            if push_config.get("SMTP_SSL") == "true"
-            else smtplib.SMTP(push_config.get("SMTP_SERVER"))
-        )
+    smtp_class = smtplib.SMTP_SSL if push_config.get("SMTP_SSL") == "true" else smtplib.SMTP
+    with smtp_class(push_config.get("SMTP_SERVER"), timeout=notify_timeout()) as smtp_server:
         smtp_server.login(
             push_config.get("SMTP_EMAIL"), push_config.get("SMTP_PASSWORD")
         )
@@ -693,10 +942,6 @@ def smtp(title: str, content: str) -> None:
             push_config.get("SMTP_EMAIL"),
             message.as_bytes(),
         )
-        smtp_server.close()
-        print("SMTP 邮件 推送成功！")
-    except Exception as e:
-        print(f"SMTP 邮件 推送失败！{e}")
 
 
 def pushme(title: str, content: str) -> None:
@@ -708,6 +953,16 @@ def pushme(title: str, content: str) -> None:
         return
     print("PushMe 服务启动")
 
+    req = pushme_request(title, content)
+    response = request_sync(req)
+
+    if req["check"](response):
+        print("PushMe 推送成功！")
+    else:
+        print(f'PushMe 推送失败！{response["status"]} {response["text"]}')
+
+
+def pushme_request(title: str, content: str) -> dict:
     url = (
         push_config.get("PUSHME_URL")
         if push_config.get("PUSHME_URL")
@@ -720,12 +975,13 @@ def pushme(title: str, content: str) -> None:
         "date": push_config.get("date") if push_config.get("date") else "",
         "type": push_config.get("type") if push_config.get("type") else "",
     }
-    response = requests.post(url, data=data)
-
-    if response.status_code == 200 and response.text == "success":
-        print("PushMe 推送成功！")
-    else:
-        print(f"PushMe 推送失败！{response.status_code} {response.text}")
+    return {
+        "method": "POST",
+        "url": url,
+        "data": data,
+        "raw": True,
+        "check": lambda response: response["status"] == 200 and response["text"] == "success",
+    }
 
 
 def chronocat(title: str, content: str) -> None:
@@ -742,6 +998,16 @@ def chronocat(title: str, content: str) -> None:
 
     print("CHRONOCAT 服务启动")
 
+    for req in chronocat_request(title, content):
+        response = request_sync(req)
+        if req["check"](response):
+            print(f'QQ{req["target"]}推送成功！')
+        else:
+            print(f'QQ{req["target"]}推送失败！')
+
+
+def chronocat_request(title: str, content: str) -> list:
+    # 每个 QQ 号、群号各一个请求
     user_ids = re.findall(r"user_id=(\d+)", push_config.get("CHRONOCAT_QQ"))
     group_ids = re.findall(r"group_id=(\d+)", push_config.get("CHRONOCAT_QQ"))
 
@@ -751,9 +1017,8 @@ def chronocat(title: str, content: str) -> None:
         "Authorization": f'Bearer {push_config.get("CHRONOCAT_TOKEN")}',
     }
 
+    reqs = []
     for chat_type, ids in [(1, user_ids), (2, group_ids)]:
-        if not ids:
-            continue
         for chat_id in ids:
             data = {
                 "peer": {"chatType": chat_type, "peerUin": chat_id},
@@ -764,17 +1029,18 @@ def chronocat(title: str, content: str) -> None:
                     }
                 ],
             }
-            response = requests.post(url, headers=headers, data=json.dumps(data))
-            if response.status_code == 200:
-                if chat_type == 1:
-                    print(f"QQ个人消息:{ids}推送成功！")
-                else:
-                    print(f"QQ群消息:{ids}推送成功！")
-            else:
-                if chat_type == 1:
-                    print(f"QQ个人消息:{ids}推送失败！")
-                else:
-                    print(f"QQ群消息:{ids}推送失败！")
+            reqs.append(
+                {
+                    "method": "POST",
+                    "url": url,
+                    "data": json.dumps(data),
+                    "headers": headers,
+                    "raw": True,
+                    "target": f'{"个人" if chat_type == 1 else "群"}消息:{chat_id}',
+                    "check": lambda response: response["status"] == 200,
+                }
+            )
+    return reqs
 
 
 def parse_headers(headers):
@@ -838,6 +1104,20 @@ def custom_notify(title: str, content: str) -> None:
 
     print("自定义通知服务启动")
 
+    try:
+        req = custom_notify_request(title, content)
+    except ValueError as e:
+        print(e)
+        return
+    response = request_sync(req)
+
+    if req["check"](response):
+        print("自定义通知推送成功！")
+    else:
+        print(f'自定义通知推送失败！{response["status"]} {response["text"]}')
+
+
+def custom_notify_request(title: str, content: str) -> dict:
     WEBHOOK_URL = push_config.get("WEBHOOK_URL")
     WEBHOOK_METHOD = push_config.get("WEBHOOK_METHOD")
     WEBHOOK_CONTENT_TYPE = push_config.get("WEBHOOK_CONTENT_TYPE")
@@ -845,8 +1125,7 @@ def custom_notify(title: str, content: str) -> None:
     WEBHOOK_HEADERS = push_config.get("WEBHOOK_HEADERS")
 
     if "$title" not in WEBHOOK_URL and "$title" not in WEBHOOK_BODY:
-        print("请求头或者请求体中必须包含 $title 和 $content")
-        return
+        raise ValueError("请求头或者请求体中必须包含 $title 和 $content")
 
     headers = parse_headers(WEBHOOK_HEADERS)
     body = parse_body(
@@ -857,24 +1136,102 @@ def custom_notify(title: str, content: str) -> None:
     formatted_url = WEBHOOK_URL.replace(
         "$title", urllib.parse.quote_plus(title)
     ).replace("$content", urllib.parse.quote_plus(content))
-    response = requests.request(
-        method=WEBHOOK_METHOD, url=formatted_url, headers=headers, timeout=15, data=body
-    )
+    return {
+        "method": WEBHOOK_METHOD,
+        "url": formatted_url,
+        "data": body,
+        "headers": headers,
+        "raw": True,
+        "check": lambda response: response["status"] == 200,
+    }
 
-    if response.status_code == 200:
-        print("自定义通知推送成功！")
-    else:
-        print(f"自定义通知推送失败！{response.status_code} {response.text}")
+
+# 一言缓存池：推送时只从本地取用，数量不足时在后台线程补充，离线时使用内置句子
+HITOKOTO_POOL_PATH = os.path.join(tempfile.gettempdir(), "hitokoto_pool.json")
+HITOKOTO_POOL_SIZE = 20
+HITOKOTO_REFILL_THRESHOLD = 5
+HITOKOTO_FALLBACK = [
+    "路漫漫其修远兮，吾将上下而求索。    ----离骚",
+    "长风破浪会有时，直挂云帆济沧海。    ----行路难",
+    "千里之行，始于足下。    ----道德经",
+    "业精于勤，荒于嬉；行成于思，毁于随。    ----进学解",
+    "不积跬步，无以至千里；不积小流，无以成江海。    ----劝学",
+    "会当凌绝顶，一览众山小。    ----望岳",
+    "山重水复疑无路，柳暗花明又一村。    ----游山西村",
+    "纸上得来终觉浅，绝知此事要躬行。    ----冬夜读书示子聿",
+    "人生若只如初见，何事秋风悲画扇。    ----木兰花令",
+    "海内存知己，天涯若比邻。    ----送杜少府之任蜀州",
+]
+hitokoto_lock = threading.Lock()
+hitokoto_refilling = False
+
+
+def load_hitokoto_pool(path: str) -> list:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return []
+
+
+def save_hitokoto_pool(path: str, pool: list) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pool, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def fetch_hitokoto() -> str:
+    url = "https://v1.hitokoto.cn/"
+    res = requests.get(url, timeout=5).json()
+    return res["hitokoto"] + "    ----" + res["from"]
+
+
+def refill_hitokoto(path: str) -> None:
+    """
+    补充一言缓存池，获取失败时停止，下次取用时再试。
+    """
+    global hitokoto_refilling
+    try:
+        start = time.time()
+        for _ in range(HITOKOTO_POOL_SIZE):
+            # 限制补充总时长
+            if time.time() - start > 10:
+                break
+            try:
+                quote = fetch_hitokoto()
+            except Exception:
+                break
+            # 逐条写入，进程退出中断补充时已获取的句子不会丢失
+            with hitokoto_lock:
+                pool = load_hitokoto_pool(path)
+                if quote not in pool:
+                    pool.append(quote)
+                    save_hitokoto_pool(path, pool[-HITOKOTO_POOL_SIZE * 2 :])
+    finally:
+        hitokoto_refilling = False
 
 
 def one() -> str:
     """
-    获取一条一言。
+    获取一条一言，不等待网络请求。
     :return:
     """
-    url = "https://v1.hitokoto.cn/"
-    res = requests.get(url).json()
-    return res["hitokoto"] + "    ----" + res["from"]
+    global hitokoto_refilling
+    path = push_config.get("HITOKOTO_POOL") or HITOKOTO_POOL_PATH
+    with hitokoto_lock:
+        pool = load_hitokoto_pool(path)
+        quote = pool.pop(random.randrange(len(pool))) if pool else None
+        if quote:
+            try:
+                save_hitokoto_pool(path, pool)
+            except Exception:
+                pass
+        if len(pool) < HITOKOTO_REFILL_THRESHOLD and not hitokoto_refilling:
+            hitokoto_refilling = True
+            # 后台线程不阻止进程退出，未补充完的下次取用时再补
+            threading.Thread(target=refill_hitokoto, args=(path,), name="hitokoto", daemon=True).start()
+    return quote or random.choice(HITOKOTO_FALLBACK)
 
 
 def add_notify_function():
@@ -941,37 +1298,290 @@ def add_notify_function():
     return notify_function
 
 
-def send(title: str, content: str, ignore_default_config: bool = False, **kwargs):
+def prepare_send(title: str, content: str, ignore_default_config: bool, kwargs: dict) -> bool:
     if kwargs:
-        global push_config
         if ignore_default_config:
-            push_config = kwargs  # 清空从环境变量获取的配置
+            push_config.bind(kwargs)  # 清空从环境变量获取的配置
         else:
-            push_config.update(kwargs)
+            push_config.bind({**push_config.current(), **kwargs})
 
     if not content:
         print(f"{title} 推送内容为空！")
-        return
+        return False
 
     # 根据标题跳过一些消息推送，环境变量：SKIP_PUSH_TITLE 用回车分隔
     skipTitle = os.getenv("SKIP_PUSH_TITLE")
     if skipTitle:
         if title in re.split("\n", skipTitle):
             print(f"{title} 在SKIP_PUSH_TITLE环境变量内，跳过推送！")
-            return
+            return False
+    return True
+
+
+def send(title: str, content: str, ignore_default_config: bool = False, **kwargs):
+    if not prepare_send(title, content, ignore_default_config, kwargs):
+        return
 
     hitokoto = push_config.get("HITOKOTO", "false")
     content += "\n\n" + one() if hitokoto != "false" else ""
 
     notify_function = add_notify_function()
+    # 各线程在当前上下文的副本中运行，读取本次推送的配置
     ts = [
-        threading.Thread(target=mode, args=(title, content), name=mode.__name__)
+        threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(mode, title, content),
+            name=mode.__name__,
+        )
         for mode in notify_function
     ]
     [t.start() for t in ts]
     [t.join() for t in ts]
 
 
+# 可直接用 aiohttp 发送的渠道（返回一个或多个请求）
+REQUEST_BUILDERS = {
+    bark: bark_request,
+    dingding_bot: dingding_bot_request,
+    feishu_bot: feishu_bot_request,
+    go_cqhttp: go_cqhttp_request,
+    gotify: gotify_request,
+    iGot: iGot_request,
+    serverJ: serverJ_request,
+    pushdeer: pushdeer_request,
+    chat: chat_request,
+    pushplus_bot: pushplus_bot_request,
+    weplus_bot: weplus_bot_request,
+    qmsg_bot: qmsg_bot_request,
+    wecom_bot: wecom_bot_request,
+    telegram_bot: telegram_bot_request,
+    aibotk: aibotk_request,
+    pushme: pushme_request,
+    chronocat: chronocat_request,
+    custom_notify: custom_notify_request,
+}
+# 不是单纯 HTTP 请求的渠道：在守护线程中执行，失败时抛出异常
+THREAD_SENDERS = {
+    wecom_app: wecom_app_send,
+    smtp: smtp_send,
+}
+
+# 各渠道单条消息长度上限（bytes 为按 UTF-8 字节计算）与频率限制（rate 条 / per 秒），
+# 频率按 keys 对应的机器人分别计算
+CHANNEL_LIMITS = {
+    "bark": {"size": 3500, "bytes": True},
+    "dingding_bot": {"size": 18000, "bytes": True, "rate": 20, "per": 60, "keys": ("DD_BOT_TOKEN",)},
+    "feishu_bot": {"size": 18000, "bytes": True, "rate": 100, "per": 60, "keys": ("FSKEY",)},
+    "wecom_bot": {"size": 2000, "bytes": True, "rate": 20, "per": 60, "keys": ("QYWX_KEY",)},
+    "telegram_bot": {"size": 4000, "rate": 20, "per": 60, "keys": ("TG_BOT_TOKEN",)},
+    "pushplus_bot": {"size": 18000},
+    "weplus_bot": {"size": 18000},
+}
+# 发送失败的分段重试次数
+NOTIFY_RETRIES = 2
+
+
+class TokenBucket:
+    """
+    令牌桶，同一进程内的多次推送共用，按渠道与机器人限制发送频率。
+    """
+
+    def __init__(self, rate: int, per: float):
+        self.capacity = rate
+        self.tokens = rate
+        self.per = per
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated) * self.capacity / self.per,
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) * self.per / self.capacity)
+
+
+token_buckets = {}
+
+
+def chunk_sections(sections: list, size: int, use_bytes: bool = False) -> list:
+    """
+    按段落（每个任务一段）将消息拆分为不超过 size 的若干条，超长的段落再按行拆分。
+    """
+    measure = (lambda text: len(text.encode("utf-8"))) if use_bytes else len
+
+    def split_long(text):
+        pieces = []
+        for line in text.split("\n"):
+            while measure(line) > size:
+                cut = size
+                while measure(line[:cut]) > size:
+                    cut = cut * 3 // 4 or 1
+                pieces.append(line[:cut])
+                line = line[cut:]
+            pieces.append(line)
+        return pieces
+
+    chunks = []
+    current = ""
+    for section in sections:
+        for piece in [section] if measure(section) <= size else split_long(section):
+            candidate = f"{current}\n{piece}" if current else piece
+            if current and measure(candidate) > size:
+                chunks.append(current)
+                current = piece
+            else:
+                current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def run_in_thread(func, *args, timeout: float):
+    """
+    在守护线程中执行，超时后不再等待。不使用事件循环的默认线程池，
+    事件循环关闭时不会等待未结束的线程，进程可以正常退出。
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    context = contextvars.copy_context()
+
+    def set_result(result, error):
+        if not future.done():
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def target():
+        result, error = None, None
+        try:
+            result = context.run(func, *args)
+        except Exception as e:
+            error = e
+        try:
+            loop.call_soon_threadsafe(set_result, result, error)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    threading.Thread(target=target, name=func.__name__, daemon=True).start()
+    return await asyncio.wait_for(future, timeout)
+
+
+async def send_chunk(session, mode, title: str, content: str, timeout: float):
+    if mode in REQUEST_BUILDERS:
+        reqs = REQUEST_BUILDERS[mode](title, content)
+        for req in reqs if isinstance(reqs, list) else [reqs]:
+            if aiohttp:
+                response = await request_async(session, req, timeout)
+            else:
+                response = await run_in_thread(request_sync, req, timeout, timeout=timeout)
+            if not req["check"](response):
+                raise RuntimeError(str(response)[:200])
+    elif mode in THREAD_SENDERS:
+        await run_in_thread(THREAD_SENDERS[mode], title, content, timeout=timeout)
+    else:
+        # 控制台输出，无网络请求
+        mode(title, content)
+
+
+async def send_channel(session, mode, title: str, sections: list, timeout: float) -> dict:
+    """
+    通过单个渠道推送：按渠道限制拆分、限速发送，失败的分段重试；返回耗时与结果。
+    """
+    start = time.time()
+    name = mode.__name__
+    limits = CHANNEL_LIMITS.get(name, {})
+    if limits.get("size"):
+        # 预留标题与分段序号的长度
+        reserve = len(title.encode("utf-8")) + 16
+        chunks = chunk_sections(sections, limits["size"] - reserve, limits.get("bytes", False))
+    else:
+        chunks = ["\n".join(sections)]
+    bucket = None
+    if limits.get("rate"):
+        key = (name, *(push_config.get(k) for k in limits.get("keys", ())))
+        bucket = token_buckets.setdefault(key, TokenBucket(limits["rate"], limits["per"]))
+    result = {"channel": name, "ok": False, "error": "", "chunks": len(chunks), "sent": 0}
+    for index, chunk in enumerate(chunks):
+        chunk_title = f"{title} ({index + 1}/{len(chunks)})" if len(chunks) > 1 else title
+        for attempt in range(NOTIFY_RETRIES + 1):
+            if bucket:
+                await bucket.acquire()
+            try:
+                await send_chunk(session, mode, chunk_title, chunk, timeout)
+                result["sent"] += 1
+                break
+            except asyncio.TimeoutError:
+                result["error"] = "超时"
+                if mode not in REQUEST_BUILDERS or not aiohttp:
+                    # 线程仍在发送，可能稍后送达，重试会重复推送
+                    break
+            except Exception as e:
+                result["error"] = str(e) or e.__class__.__name__
+            if attempt < NOTIFY_RETRIES:
+                await asyncio.sleep(2**attempt)
+    result["ok"] = result["sent"] == len(chunks)
+    if result["ok"]:
+        result["error"] = ""
+    result["latency"] = round(time.time() - start, 2)
+    return result
+
+
+async def send_async(
+    title: str,
+    content,
+    ignore_default_config: bool = False,
+    session=None,
+    **kwargs,
+) -> list:
+    """
+    异步并行推送到全部渠道，每个渠道单独超时，不阻塞事件循环；返回各渠道的耗时与结果。
+    content 可以是字符串，或按任务分段的列表，超出渠道长度限制时在段落之间拆分。
+    """
+    if not prepare_send(title, content, ignore_default_config, kwargs):
+        return []
+
+    sections = list(content) if isinstance(content, (list, tuple)) else [content]
+    hitokoto = push_config.get("HITOKOTO", "false")
+    if hitokoto != "false":
+        sections.append("\n" + one())
+
+    timeout = notify_timeout()
+    notify_function = add_notify_function()
+    if not notify_function:
+        return []
+    if aiohttp and session is None:
+        async with aiohttp.ClientSession() as session:
+            return await send_channels(session, notify_function, title, sections, timeout)
+    return await send_channels(session, notify_function, title, sections, timeout)
+
+
+async def send_channels(session, notify_function: list, title: str, sections: list, timeout: float) -> list:
+    results = await asyncio.gather(
+        *[
+            send_channel(session, mode, title, sections, timeout)
+            for mode in notify_function
+        ]
+    )
+    print(
+        "推送汇总："
+        + "，".join(
+            f'{r["channel"]} {"✅" if r["ok"] else "❌"} {r["latency"]}s'
+            + (f' {r["sent"]}/{r["chunks"]}条' if r["chunks"] > 1 else "")
+            + (f' {r["error"]}' if r["error"] else "")
+            for r in results
+        )
+    )
+    return results
+
+
 def main():
     send("title", "content")
 
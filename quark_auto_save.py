@@ -10,11 +10,18 @@ import sys
 import json
 import time
 import random
+import heapq
+import hashlib
 import asyncio
+import sqlite3
+import argparse
 import aiohttp
 import logging
-from datetime import datetime
-from functools import lru_cache
+import contextvars
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from quark_mirror import DriveMirror
+from config_store import ConfigStore
 
 # 兼容青龙
 try:
@@ -23,10 +30,128 @@ except ImportError:
     os.system("pip3 install treelib aiohttp &> /dev/null")
     from treelib import Tree
 
-CONFIG_DATA = {}
-NOTIFYS = []
+class ContextProxy:
+    # 按 contextvars 上下文隔离的全局对象：多个配置在同一进程中并发运行时，各自的配置与通知互不干扰
+    def __init__(self, name, default):
+        self._var = contextvars.ContextVar(name)
+        self._default = default
+
+    def current(self):
+        return self._var.get(self._default)
+
+    def bind(self, value):
+        self._var.set(value)
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+    def __getitem__(self, key):
+        return self.current()[key]
+
+    def __setitem__(self, key, value):
+        self.current()[key] = value
+
+    def __delitem__(self, key):
+        del self.current()[key]
+
+    def __contains__(self, key):
+        return key in self.current()
+
+    def __iter__(self):
+        return iter(self.current())
+
+    def __len__(self):
+        return len(self.current())
+
+    def __bool__(self):
+        return bool(self.current())
+
+    def __repr__(self):
+        return repr(self.current())
+
+CONFIG_DATA = ContextProxy("config_data", {})
+NOTIFYS = ContextProxy("notifys", [])
+# 多配置并发运行时的日志前缀
+RUN_LABEL = contextvars.ContextVar("run_label", default="")
+# 流式推送：运行中的消息接收端，未开启时为 None
+NOTIFY_SINK = contextvars.ContextVar("notify_sink", default=None)
+NOTIFY_TITLE = "【夸克自动追更】"
+# 当前配置的配置文件读写与任务状态存储
+CONFIG_STORE = contextvars.ContextVar("config_store", default=None)
+STATE_STORE = contextvars.ContextVar("state_store", default=None)
+# 多配置并发运行时共用的分享缓存
+SHARE_CACHE = contextvars.ContextVar("share_cache", default=None)
+# 运行中会被更新、需要写回配置的任务字段
+TASK_STATE_KEYS = (
+    "shareurl_ban",
+    "shareurl_ban_count",
+    "shareurl_ban_time",
+    "emby_id",
+    "update_history",
+    "last_poll",
+    "carried",
+)
 GH_PROXY = os.environ.get("GH_PROXY", "https://ghproxy.net/")
 
+# 回收站分页大小、并发页数、单次删除记录数
+RECYCLE_PAGE_SIZE = 100
+RECYCLE_CONCURRENCY = 5
+RECYCLE_REMOVE_BATCH = 500
+
+# 检查点有效时间窗口（秒），超过后中断的运行不再续跑
+CHECKPOINT_WINDOW = 3600
+
+# 失效分享的重新检查间隔（秒），按连续失败次数递增：1小时、6小时、1天、1周
+SHAREURL_RECHECK_INTERVALS = (3600, 6 * 3600, 86400, 7 * 86400)
+
+# 自适应轮询：保留的更新记录数、最短/最长轮询间隔、预期更新时间前后的密集检查窗口（秒）
+POLL_HISTORY_SIZE = 20
+POLL_MIN_INTERVAL = 3600
+POLL_MAX_INTERVAL = 7 * 86400
+POLL_RELEASE_WINDOW = 2 * 3600
+# 超过更新间隔中位数的多少倍未更新视为休眠
+POLL_DORMANT_FACTOR = 4
+
+# 两阶段执行时生成计划、执行写操作的并发数
+PLAN_CONCURRENCY = 5
+EXECUTE_CONCURRENCY = 5
+# 转存返回的容量不足错误码与错误信息（如 "capacity limit[{0}]"、"容量不足"）
+CAPACITY_ERROR_CODE = 32003
+CAPACITY_ERROR_MESSAGES = ("capacity limit", "容量不足", "空间不足")
+# 目标目录已被删除时的错误信息
+NOT_FOUND_MESSAGES = ("不存在", "not exist", "not found")
+# 目标目录分桶：按季、年份或集数区间（默认每100集）建子目录，匹配正则替换后的文件名
+BUCKET_SIZE = 100
+BUCKET_REGEX = {
+    "season": r"S(\d{1,2})E\d|第(\d{1,2})季",
+    "year": r"(?<!\d)((?:19|20)\d{2})(?!\d)",
+    "episode": r"(?:E|EP|第)(\d{1,4})|^(\d{1,4})(?!\d)",
+}
+
+# 流式推送默认的合并窗口（秒）：窗口内产生的消息合并为一条推送
+NOTIFY_STREAM_WINDOW = 10
+
+# crontab 中月份、星期的英文缩写
+CRON_MONTHS = {name: i for i, name in enumerate(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+CRON_WEEKDAYS = {name: i for i, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+
+# 常驻模式默认定时规则、账号重新验证间隔（秒）
+DAEMON_CRONTAB = "0 8,18,20 * * *"
+# 预热结果在计划运行时间后仍保留的时长
+WARMUP_GRACE = 600
+DAEMON_REVERIFY_INTERVAL = 6 * 3600
+
+# Emby 刷新并发数、最后一次入队后自动刷新的等待时间（秒）、请求超时（秒）
+EMBY_CONCURRENCY = 3
+EMBY_DEBOUNCE = 60
+EMBY_TIMEOUT = 30
+# 媒体库中未搜索到的名称在此时间内不再重复搜索
+EMBY_SEARCH_MISS_TTL = 86400
+# 按路径通知媒体库变动时单个请求的路径数、默认的项目刷新模式（只补充缺失的元数据与图片）
+EMBY_UPDATE_BATCH = 200
+EMBY_REFRESH_MODE = "Default"
+
 MAGIC_REGEX = {
     "$TV": {
         "pattern": ".*?(S\\d{1,2}E)?P?(\\d{1,3}).*?\\.(mpmkv)",
@@ -54,6 +179,14 @@ stream_handler.setFormatter(stream_formatter)
 logger.addHandler(file_handler)
 logger.addHandler(stream_handler)
 
+class RunLabelFilter(logging.Filter):
+    def filter(self, record):
+        if RUN_LABEL.get():
+            record.msg = f"[{RUN_LABEL.get()}] {record.msg}"
+        return True
+
+logger.addFilter(RunLabelFilter())
+
 async def fetch(session, method, url, **kwargs):
     try:
         async with session.request(method, url, **kwargs) as response:
@@ -71,22 +204,71 @@ def magic_regex_func(pattern, replace):
             replace = CONFIG_DATA["magic_regex"][keyword]["replace"]
     return pattern, replace
 
-async def send_ql_notify(title, body):
+async def send_ql_notify(title, body, session=None):
     try:
         import notify
+        # 一言缓存池与配置文件放在一起
+        config_store = CONFIG_STORE.get()
+        pool = {"HITOKOTO_POOL": state_path(config_store.path, "hitokoto.json")} if config_store else {}
         if CONFIG_DATA.get("push_config"):
-            CONFIG_DATA["push_config"]["CONSOLE"] = True
-            notify.push_config = CONFIG_DATA["push_config"]
-        await notify.send(title, body)
+            # 只在当前上下文中生效，多个配置并发推送时各自使用自己的渠道
+            notify.push_config.bind({**pool, **CONFIG_DATA["push_config"], "CONSOLE": True})
+        elif pool:
+            notify.push_config.bind({**notify.push_config.current(), **pool})
+        await notify.send_async(title, body, session=session)
     except Exception as e:
         logger.error(f"发送通知消息失败: {e}")
 
 def add_notify(text):
-    global NOTIFYS
     NOTIFYS.append(text)
     logger.info(text)
+    sink = NOTIFY_SINK.get()
+    if sink:
+        sink.put(text)
     return text
 
+class NotifySink:
+    # 流式推送：消息在时间窗口内合并后立即推送，不等全部任务结束
+    def __init__(self, session, window):
+        self.session = session
+        self.window = window
+        self.buffer = []
+        self.timer = None
+        self.sending = set()
+
+    def put(self, text):
+        self.buffer.append(text)
+        if self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush(self):
+        self.timer = None
+        if not self.buffer:
+            return
+        texts, self.buffer = self.buffer, []
+        task = asyncio.ensure_future(send_ql_notify(NOTIFY_TITLE, texts, self.session))
+        self.sending.add(task)
+        task.add_done_callback(self.sending.discard)
+
+    async def close(self):
+        if self.timer:
+            self.timer.cancel()
+        self.flush()
+        if self.sending:
+            await asyncio.gather(*self.sending)
+
+def open_notify_sink(session):
+    # 配置 "notify_stream": true 或合并窗口秒数时开启流式推送
+    stream = CONFIG_DATA.get("notify_stream")
+    sink = None
+    if stream:
+        sink = NotifySink(session, NOTIFY_STREAM_WINDOW if stream is True else float(stream))
+        # 开启前已产生的消息（如账号登录失败）一并推送
+        for text in NOTIFYS:
+            sink.put(text)
+    NOTIFY_SINK.set(sink)
+    return sink
+
 def download_file_sync(url, save_path):
     try:
         import requests
@@ -113,6 +295,466 @@ def get_cookies(cookie_val):
     else:
         return False
 
+def ban_share(task, message):
+    task["shareurl_ban"] = message
+    task["shareurl_ban_count"] = task.get("shareurl_ban_count", 0) + 1
+    task["shareurl_ban_time"] = int(time.time())
+    # 仅首次失效时通知，之后的重新检查只记录日志
+    if task["shareurl_ban_count"] == 1:
+        add_notify(f"❌《{task['taskname']}》：{message}\n")
+    else:
+        logger.info(f"《{task['taskname']}》：{message}，连续失效 {task['shareurl_ban_count']} 次")
+
+def unban_share(task):
+    for key in ("shareurl_ban", "shareurl_ban_count", "shareurl_ban_time"):
+        task.pop(key, None)
+
+def apply_share_state(task, plan):
+    # 将计划中记录的分享失效、恢复写入任务
+    if plan["ban"]:
+        ban_share(task, plan["ban"])
+    elif plan["unban"]:
+        unban_share(task)
+        add_notify(f"✅《{task['taskname']}》分享已恢复")
+
+def share_recheck_time(task):
+    count = max(task.get("shareurl_ban_count", 1), 1)
+    interval = SHAREURL_RECHECK_INTERVALS[min(count, len(SHAREURL_RECHECK_INTERVALS)) - 1]
+    return task.get("shareurl_ban_time", 0) + interval
+
+def record_poll(task, is_new, now=None):
+    now = int(now or time.time())
+    task["last_poll"] = now
+    if is_new:
+        task["update_history"] = (task.get("update_history", []) + [now])[-POLL_HISTORY_SIZE:]
+
+def poll_schedule(task, now=None):
+    # 根据历史更新时间推算轮询间隔：预期更新时段内每次都检查，平时按更新间隔的1/4，长期未更新则降到最低频率
+    now = now or time.time()
+    history = task.get("update_history", [])
+    last_poll = task.get("last_poll", 0)
+    if len(history) < 2:
+        return {"state": "learning", "interval": 0, "next_poll": last_poll, "release_hours": []}
+    gaps = sorted(b - a for a, b in zip(history, history[1:]))
+    median_gap = max(gaps[len(gaps) // 2], POLL_MIN_INTERVAL)
+    hour_count = {}
+    for ts in history:
+        hour = datetime.fromtimestamp(ts).hour
+        hour_count[hour] = hour_count.get(hour, 0) + 1
+    release_hours = sorted(h for h, c in hour_count.items() if c >= 2) or sorted(hour_count)
+    now_dt = datetime.fromtimestamp(now)
+    now_hours = now_dt.hour + now_dt.minute / 60
+    near_release = any(
+        min(abs(now_hours - h), 24 - abs(now_hours - h)) * 3600 <= POLL_RELEASE_WINDOW
+        for h in release_hours
+    )
+    if now - history[-1] > POLL_DORMANT_FACTOR * median_gap:
+        state, interval = "dormant", POLL_MAX_INTERVAL
+    elif near_release:
+        state, interval = "release", 0
+    else:
+        state = "active"
+        interval = int(min(max(median_gap // 4, POLL_MIN_INTERVAL), POLL_MAX_INTERVAL))
+    return {
+        "state": state,
+        "interval": interval,
+        "next_poll": last_poll + interval,
+        "release_hours": release_hours,
+    }
+
+def task_priority(task, now=None):
+    # 分值越高越先执行：临近预期更新时间、临近截止日期优先，近期失效的分享靠后
+    now = now or time.time()
+    state_score = {"release": 100, "active": 10, "learning": 5, "dormant": 0}
+    score = state_score[poll_schedule(task, now)["state"]]
+    if task.get("enddate"):
+        days_left = (datetime.strptime(task["enddate"], "%Y-%m-%d").date() - datetime.fromtimestamp(now).date()).days
+        score += max(0, 7 - days_left) * 5
+    score -= task.get("shareurl_ban_count", 0) * 20
+    return score
+
+def order_tasks(tasklist, prioritize=False):
+    # 优先队列：上次因时间预算未执行的任务最先，其次按 task_priority 排序
+    if not prioritize:
+        return list(enumerate(tasklist))
+    now = time.time()
+    queue = [
+        (0 if task.get("carried") else 1, -task_priority(task, now), index)
+        for index, task in enumerate(tasklist)
+    ]
+    heapq.heapify(queue)
+    ordered = []
+    while queue:
+        index = heapq.heappop(queue)[2]
+        ordered.append((index, tasklist[index]))
+    return ordered
+
+def parse_duration(value):
+    units = {"s": 1, "m": 60, "h": 3600}
+    value = str(value).strip().lower()
+    if value[-1:] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+def config_budget():
+    # 配置中的时间预算，无效时记录错误并忽略
+    value = CONFIG_DATA.get("budget") or 0
+    try:
+        return parse_duration(value)
+    except ValueError:
+        logger.error(f"⏳ 时间预算设置无效: {value}，不限制运行时长")
+        return 0
+
+def is_poll_due(task, now=None):
+    now = now or time.time()
+    return now >= poll_schedule(task, now)["next_poll"]
+
+def state_path(config_path, name):
+    # 运行时产生的文件与配置文件放在一起，如 quark_config.journal
+    return f"{os.path.splitext(config_path)[0]}.{name}"
+
+def journal_path(config_path, task_keys=None):
+    # 按定时规则分组运行时，每组使用各自的断点记录，各组（可能在不同进程中）互不覆盖
+    if not task_keys:
+        return state_path(config_path, "journal")
+    digest = hashlib.sha1("\n".join(sorted(task_keys)).encode("utf-8")).hexdigest()[:8]
+    return state_path(config_path, f"{digest}.journal")
+
+def parse_bucket(policy):
+    # policy 取值 season、year、count 或 count:50，返回 (分桶方式, 每桶集数)，无效时返回 None
+    by, _, size = str(policy).partition(":")
+    if by not in ("season", "year", "count") or (size and (by != "count" or not size.isdigit() or int(size) < 1)):
+        return None
+    return by, int(size or BUCKET_SIZE)
+
+def bucket_name(policy, file_name):
+    # 文件名中没有季、年份、集数，或 policy 无效时返回 None，文件仍存入目标目录
+    parsed = parse_bucket(policy)
+    if not parsed:
+        return None
+    by, size = parsed
+    match = re.search(BUCKET_REGEX["episode" if by == "count" else by], file_name, re.I)
+    if not match:
+        return None
+    number = int(next(group for group in match.groups() if group))
+    if by == "season":
+        return f"S{number:02d}"
+    elif by == "year":
+        return str(number)
+    start = (max(number, 1) - 1) // size * size + 1
+    return f"{start:03d}-{start + size - 1:03d}"
+
+def task_key(task):
+    return f"{task['taskname']}|{task['shareurl']}"
+
+class Journal:
+    # 每完成一个任务追加一条检查点，运行中断后在时间窗口内重启可跳过已完成任务
+    def __init__(self, path, window=CHECKPOINT_WINDOW):
+        self.path = path
+        self.window = window
+        self.done = {}
+
+    def load(self):
+        self.done = {}
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read()
+            # 进程被强制结束时最后一行可能只写了一半：截掉后再继续追加
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                with open(self.path, "r+b") as file:
+                    file.truncate(end)
+            records = []
+            for line in data[:end].decode("utf-8").splitlines():
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        except (OSError, ValueError) as e:
+            logger.warning(f"♻️ 断点记录无法读取，已删除: {e}")
+            records = []
+        begin = records[0].get("begin", 0) if records and isinstance(records[0], dict) else 0
+        if time.time() - begin > self.window:
+            self.finish()
+            return False
+        for record in records[1:]:
+            if isinstance(record, dict) and "key" in record:
+                self.done[record["key"]] = record
+        return True
+
+    def begin(self):
+        if not os.path.exists(self.path):
+            self.append({"begin": time.time()})
+
+    def append(self, record):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def checkpoint(self, task, notifys):
+        state = {key: task[key] for key in TASK_STATE_KEYS if key in task}
+        self.append({"key": task_key(task), "state": state, "notifys": notifys})
+
+    def restore(self, task):
+        record = self.done.get(task_key(task))
+        if record:
+            task.update(record["state"])
+            NOTIFYS.extend(record["notifys"])
+        return bool(record)
+
+    def finish(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class StateStore:
+    # 任务运行状态（TASK_STATE_KEYS）单独存放在 SQLite 中，只写入有变化的任务；配置文件只保存用户配置。
+    # 配置中填写了 emby_id 的任务以配置为准
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = {}
+        self.config_emby = {}
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS task_state (key TEXT PRIMARY KEY, state TEXT, updated_at INTEGER)"
+        )
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def dump(task):
+        return json.dumps(
+            {key: task[key] for key in TASK_STATE_KEYS if key in task}, ensure_ascii=False, sort_keys=True
+        )
+
+    def states(self):
+        return {key: json.loads(state) for key, state in self.db.execute("SELECT key, state FROM task_state")}
+
+    def apply(self, tasklist):
+        # 合并已保存的状态；没有记录的任务沿用配置文件中的旧字段，保存时迁移到状态存储
+        states = self.states()
+        for task in tasklist:
+            key = task_key(task)
+            self.config_emby[key] = task.get("emby_id")
+            if key in states:
+                state = states[key]
+                if task.get("emby_id"):
+                    state.pop("emby_id", None)
+                for field in TASK_STATE_KEYS:
+                    if field in state:
+                        task[field] = state[field]
+                    elif field != "emby_id" or not task.get("emby_id"):
+                        task.pop(field, None)
+                self.snapshot[key] = self.dump(task)
+        return tasklist
+
+    def save(self, tasklist):
+        dirty = {}
+        for task in tasklist:
+            key = task_key(task)
+            state = self.dump(task)
+            if state != self.snapshot.get(key):
+                dirty[key] = state
+        now = int(time.time())
+        self.db.executemany(
+            "INSERT INTO task_state VALUES (?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+            "state = excluded.state, updated_at = excluded.updated_at",
+            [(key, state, now) for key, state in dirty.items()],
+        )
+        # 已删除或修改了名称、链接的任务不再保留状态
+        keys = {task_key(task) for task in tasklist}
+        stale = [key for key in self.snapshot if key not in keys]
+        self.db.executemany("DELETE FROM task_state WHERE key = ?", [(key,) for key in stale])
+        self.db.commit()
+        self.snapshot.update(dirty)
+        for key in stale:
+            self.snapshot.pop(key)
+        return len(dirty)
+
+    def clear(self, key, fields):
+        # 在 Web 端手动清除的状态字段（如失效标记）
+        row = self.db.execute("SELECT state FROM task_state WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return
+        state = json.loads(row[0])
+        for field in fields:
+            state.pop(field, None)
+        self.db.execute(
+            "UPDATE task_state SET state = ?, updated_at = ? WHERE key = ?",
+            (json.dumps(state, ensure_ascii=False, sort_keys=True), int(time.time()), key),
+        )
+        self.db.commit()
+
+    def strip(self, config):
+        # 写回配置文件的内容：去掉运行状态，保留配置中填写的 emby_id
+        tasklist = []
+        for task in config.get("tasklist", []):
+            user_emby = self.config_emby.get(task_key(task))
+            tasklist.append(
+                {
+                    field: value
+                    for field, value in task.items()
+                    if field not in TASK_STATE_KEYS or (field == "emby_id" and user_emby)
+                }
+            )
+        return {**config, "tasklist": tasklist} if "tasklist" in config else dict(config)
+
+class WarmCache:
+    # 定时运行前的预热结果：账号、分享 stoken、分享列表、目录fid，由随后的正式运行读取一次
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+
+    def load(self):
+        self.data = {}
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if time.time() > data.get("expires", 0):
+            os.remove(self.path)
+            return False
+        self.data = data
+        return True
+
+    def save(self, accounts, ttl):
+        # 同一时刻多组任务分别预热时合并到同一份缓存
+        previous = self.data if self.load() else {}
+        account = accounts[0]
+        self.data = {
+            "expires": time.time() + ttl,
+            "accounts": {item.cookie: item.nickname for item in accounts if item.is_active},
+            "savepath_fid": {**previous.get("savepath_fid", {}), **account.savepath_fid},
+            "stokens": {**previous.get("stokens", {}), **account.stoken_cache},
+            "details": {**previous.get("details", {}), **account.detail_cache},
+            "validated": sorted(
+                set(previous.get("validated", [])) | (account.mirror.validated if account.mirror else set())
+            ),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.data, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def apply(self, account):
+        account.savepath_fid.update(self.data["savepath_fid"])
+        account.stoken_cache.update(self.data["stokens"])
+        account.detail_cache.update(self.data["details"])
+        if account.mirror:
+            account.mirror.validated.update(self.data["validated"])
+        account.warmed = True
+
+    def finish(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class SavedIndex:
+    # 已转存文件索引：按分享文件fid、大小+文件名记录首次保存位置，用于发现跨任务的重复转存
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.by_name = {}
+
+    def load(self):
+        self.files = {}
+        self.by_name = {}
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as file:
+            for entry in json.load(file):
+                self.put(entry)
+        return True
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(list(self.files.values()), file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def put(self, entry):
+        self.files[entry["fid"]] = entry
+        self.by_name.setdefault((entry["size"], entry["file_name"]), entry)
+
+    def find(self, item):
+        # 同一分享文件或同名同大小的文件已保存在其他目录
+        if item["dir"] or not item["size"]:
+            return None
+        entry = self.files.get(item["fid"]) or self.by_name.get((item["size"], item["file_name"]))
+        if entry and entry["savepath"] != item["savepath"]:
+            return entry
+        return None
+
+    def add(self, task, item):
+        if item["dir"] or item["fid"] in self.files or (item["size"], item["file_name"]) in self.by_name:
+            return
+        self.put(
+            {
+                "fid": item["fid"],
+                "file_name": item["file_name"],
+                "save_name": item["save_name"],
+                "size": item["size"],
+                "savepath": item["savepath"],
+                "taskname": task["taskname"],
+                "time": int(time.time()),
+            }
+        )
+
+    def mark_duplicate(self, duplicate):
+        # 每个重复位置只报告一次，返回是否首次发现
+        entry = self.files.get(duplicate["saved_fid"])
+        if not entry or duplicate["savepath"] in entry.setdefault("dupes", []):
+            return False
+        entry["dupes"].append(duplicate["savepath"])
+        return True
+
+    def merge(self, other):
+        for fid, entry in other.files.items():
+            if fid in self.files:
+                dupes = self.files[fid].setdefault("dupes", [])
+                dupes += [path for path in entry.get("dupes", []) if path not in dupes]
+            elif (entry["size"], entry["file_name"]) not in self.by_name:
+                self.put(entry)
+
+class ShareCache:
+    # 分享的 stoken 与文件列表与账号无关，多个配置跟随同一分享时本次运行中只请求一次，并发的相同请求合并
+    def __init__(self):
+        self.futures = {}
+
+    async def get(self, key, request):
+        if key not in self.futures:
+            self.futures[key] = asyncio.ensure_future(request())
+        return await asyncio.shield(self.futures[key])
+
+class RecycleLedger:
+    # 本程序删除、尚未从回收站彻底删除的文件fid；清理回收站时默认只清理这些记录，不影响用户手动删除的文件
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, "r", encoding="utf-8") as file:
+            return set(json.load(file))
+
+    def save(self, fids):
+        if not fids:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(sorted(fids), file)
+        os.replace(tmp_path, self.path)
+
+    def add(self, fids):
+        self.save(self.load() | set(fids))
+
+    def discard(self, fids):
+        self.save(self.load() - set(fids))
+
 class Quark:
     def __init__(self, cookie, index=None):
         self.cookie = cookie.strip()
@@ -122,6 +764,17 @@ class Quark:
         self.st = self.match_st_form_cookie(cookie)
         self.mparam = self.match_mparam_form_cookie(cookie)
         self.savepath_fid = {"/": "0"}
+        # 剩余空间（字节），未知时为 None，不做容量检查
+        self.free_capacity = None
+        self.saved_index = None
+        self.mirror = None
+        self.recycle_ledger = None
+        # Emby 名称→ID 搜索缓存文件
+        self.emby_cache = None
+        # 预热得到的 stoken 与分享列表，正式运行中各使用一次
+        self.stoken_cache = {}
+        self.detail_cache = {}
+        self.warmed = False
 
     def match_st_form_cookie(self, cookie):
         match = re.search(r"=(st[a-zA-Z0-9]+);", cookie)
@@ -186,6 +839,34 @@ class Quark:
         else:
             return False
 
+    async def get_member_info(self, session):
+        url = "https://drive-pc.quark.cn/1/clouddrive/member"
+        querystring = {
+            "pr": "ucpro",
+            "fr": "pc",
+            "uc_param_str": "",
+            "fetch_subscribe": "true",
+            "_ch": "home",
+            "fetch_identity": "true",
+        }
+        headers = self.common_headers()
+        response = await fetch(session, "GET", url, headers=headers, params=querystring)
+        if response and response.get("data"):
+            return response["data"]
+        else:
+            return False
+
+    def set_capacity(self, info):
+        if info and "total_capacity" in info and "use_capacity" in info:
+            self.free_capacity = max(info["total_capacity"] - info["use_capacity"], 0)
+
+    async def update_capacity(self, session):
+        # 签到时已从 growth_info 得到容量则不再请求
+        if self.free_capacity is None:
+            self.set_capacity(await self.get_member_info(session))
+        if self.free_capacity is not None:
+            logger.info(f"💾 剩余空间: {format_bytes(self.free_capacity)}")
+
     async def get_growth_sign(self, session):
         url = "https://drive-m.quark.cn/1/clouddrive/capacity/growth/sign"
         querystring = {
@@ -224,6 +905,14 @@ class Quark:
             return None
 
     async def get_stoken(self, session, pwd_id):
+        if pwd_id in self.stoken_cache:
+            return tuple(self.stoken_cache.pop(pwd_id))
+        share_cache = SHARE_CACHE.get()
+        if share_cache:
+            return await share_cache.get(("stoken", pwd_id), lambda: self.request_stoken(session, pwd_id))
+        return await self.request_stoken(session, pwd_id)
+
+    async def request_stoken(self, session, pwd_id):
         url = "https://drive-m.quark.cn/1/clouddrive/share/sharepage/token"
         querystring = {"pr": "ucpro", "fr": "h5"}
         payload = {"pwd_id": pwd_id, "passcode": ""}
@@ -237,6 +926,16 @@ class Quark:
             return False, "未知错误"
 
     async def get_detail(self, session, pwd_id, stoken, pdir_fid):
+        if f"{pwd_id}/{pdir_fid}" in self.detail_cache:
+            return self.detail_cache.pop(f"{pwd_id}/{pdir_fid}")
+        share_cache = SHARE_CACHE.get()
+        if share_cache:
+            return await share_cache.get(
+                ("detail", pwd_id, str(pdir_fid)), lambda: self.request_detail(session, pwd_id, stoken, pdir_fid)
+            )
+        return await self.request_detail(session, pwd_id, stoken, pdir_fid)
+
+    async def request_detail(self, session, pwd_id, stoken, pdir_fid):
         file_list = []
         page = 1
         while True:
@@ -266,9 +965,23 @@ class Quark:
                 break
         return file_list
 
-    @lru_cache(maxsize=128)
+    def forget_dir(self, path):
+        self.savepath_fid.pop(path, None)
+        if self.mirror:
+            self.mirror.forget(path)
+
     async def get_fids(self, session, file_paths):
-        fids = []
+        # 已知目录直接从 savepath_fid 缓存或本地镜像（仅本次运行确认过的）返回，仅查询未知目录
+        if self.mirror:
+            for path in file_paths:
+                if path not in self.savepath_fid and (fid := self.mirror.get_fid(path)):
+                    self.savepath_fid[path] = fid
+        fids = [
+            {"file_path": path, "fid": self.savepath_fid[path]}
+            for path in file_paths
+            if path in self.savepath_fid
+        ]
+        file_paths = [path for path in file_paths if path not in self.savepath_fid]
         while file_paths:
             batch = file_paths[:50]
             file_paths = file_paths[50:]
@@ -279,12 +992,18 @@ class Quark:
             response = await fetch(session, "POST", url, json=payload, headers=headers, params=querystring)
             if response and response["code"] == 0:
                 fids += response["data"]
+                for item in response["data"]:
+                    self.savepath_fid[item["file_path"]] = item["fid"]
+                    if self.mirror:
+                        self.mirror.put_dir(item["file_path"], item["fid"])
             else:
                 logger.error(f"获取目录ID失败: {response['message'] if response else '无响应'}")
                 break
         return fids
 
-    async def ls_dir(self, session, pdir_fid):
+    async def ls_dir(self, session, pdir_fid, cached=True):
+        if cached and self.mirror and self.mirror.is_fresh(pdir_fid):
+            return self.mirror.listing(pdir_fid)
         file_list = []
         page = 1
         while True:
@@ -309,8 +1028,23 @@ class Quark:
                 break
             if len(file_list) >= response["metadata"]["_total"]:
                 break
+        if self.mirror and response and response.get("code") == 0:
+            self.mirror.store_listing(pdir_fid, file_list)
         return file_list
 
+    async def sync_mirror(self, session, tasklist):
+        # 获取各目标目录的上级目录列表，updated_at 未变的目标目录本次直接使用镜像
+        parents = sorted(
+            {
+                os.path.dirname(re.sub(r"/{2,}", "/", f"/{task['savepath']}").rstrip("/")) or "/"
+                for task in tasklist
+            }
+        )
+        fids = await self.get_fids(session, parents)
+        await asyncio.gather(*[self.ls_dir(session, item["fid"], cached=False) for item in fids])
+        unchanged = self.mirror.validated - {str(item["fid"]) for item in fids}
+        logger.info(f"🗂️ 本地镜像已同步 {len(fids)} 个上级目录，{len(unchanged)} 个目录无变动")
+
     async def save_file(self, session, fid_list, fid_token_list, to_pdir_fid, pwd_id, stoken):
         url = "https://drive-m.quark.cn/1/clouddrive/share/sharepage/save"
         querystring = {
@@ -333,6 +1067,8 @@ class Quark:
         }
         headers = self.common_headers()
         response = await fetch(session, "POST", url, json=payload, headers=headers, params=querystring)
+        if self.mirror:
+            self.mirror.invalidate(to_pdir_fid)
         return response
 
     async def mkdir(self, session, dir_path):
@@ -346,6 +1082,8 @@ class Quark:
         }
         headers = self.common_headers()
         response = await fetch(session, "POST", url, json=payload, headers=headers, params=querystring)
+        if self.mirror and response and response.get("code") == 0:
+            self.mirror.put_dir(dir_path, response["data"]["fid"])
         return response
 
     async def rename(self, session, fid, file_name):
@@ -354,6 +1092,8 @@ class Quark:
         payload = {"fid": fid, "file_name": file_name}
         headers = self.common_headers()
         response = await fetch(session, "POST", url, json=payload, headers=headers, params=querystring)
+        if self.mirror and response and response.get("code") == 0:
+            self.mirror.rename(fid, file_name)
         return response
 
     async def delete(self, session, filelist):
@@ -362,23 +1102,52 @@ class Quark:
         payload = {"action_type": 2, "filelist": filelist, "exclude_fids": []}
         headers = self.common_headers()
         response = await fetch(session, "POST", url, json=payload, headers=headers, params=querystring)
+        if response and response.get("code") == 0:
+            if self.mirror:
+                self.mirror.remove(filelist)
+            if self.recycle_ledger:
+                self.recycle_ledger.add(filelist)
         return response
 
-    async def recycle_list(self, session, page=1, size=30):
+    async def recycle_list_page(self, session, page=1, size=30):
         url = "https://drive-m.quark.cn/1/clouddrive/file/recycle/list"
         querystring = {
             "_page": page,
             "_size": size,
+            "_fetch_total": "1",
             "pr": "ucpro",
             "fr": "pc",
             "uc_param_str": "",
         }
         headers = self.common_headers()
         response = await fetch(session, "GET", url, headers=headers, params=querystring)
-        if response:
-            return response["data"]["list"]
+        if response and response.get("data"):
+            total = response.get("metadata", {}).get("_total", 0)
+            return response["data"]["list"], total
         else:
-            return []
+            return [], 0
+
+    async def recycle_list(self, session, page=1, size=30):
+        record_list, _ = await self.recycle_list_page(session, page, size)
+        return record_list
+
+    async def recycle_list_all(self, session, size=RECYCLE_PAGE_SIZE):
+        # 先取第一页得到总数，其余页并发获取
+        record_list, total = await self.recycle_list_page(session, 1, size)
+        pages = (total + size - 1) // size
+        if pages > 1:
+            semaphore = asyncio.Semaphore(RECYCLE_CONCURRENCY)
+
+            async def fetch_page(page):
+                async with semaphore:
+                    return await self.recycle_list(session, page, size)
+
+            results = await asyncio.gather(
+                *[fetch_page(page) for page in range(2, pages + 1)]
+            )
+            for page_list in results:
+                record_list += page_list
+        return record_list
 
     async def recycle_remove(self, session, record_list):
         url = "https://drive-m.quark.cn/1/clouddrive/file/recycle/remove"
@@ -391,6 +1160,27 @@ class Quark:
         response = await fetch(session, "POST", url, json=payload, headers=headers, params=querystring)
         return response
 
+    async def purge_recycle(self, session, fids=None, all_pages=True):
+        # 清理回收站记录：fids 为 None 时清理全部；all_pages 为 False 时只查看第一页（最近删除的记录）
+        if all_pages:
+            record_list = await self.recycle_list_all(session)
+        else:
+            record_list = await self.recycle_list(session)
+        records = [item for item in record_list if fids is None or item["fid"] in fids]
+        removed = set()
+        for i in range(0, len(records), RECYCLE_REMOVE_BATCH):
+            batch = records[i : i + RECYCLE_REMOVE_BATCH]
+            response = await self.recycle_remove(session, [item["record_id"] for item in batch])
+            if response and response.get("code") == 0:
+                removed.update(item["fid"] for item in batch)
+            else:
+                logger.error(f"清理回收站失败: {response['message'] if response else '无响应'}")
+        if self.recycle_ledger:
+            # 已清理的记录，以及整个回收站中都已找不到（已过期或被还原）的记录不再保留
+            gone = set(fids or ()) - {item["fid"] for item in record_list} if all_pages and record_list else set()
+            self.recycle_ledger.discard(removed | gone)
+        return len(removed)
+
     async def update_savepath_fid(self, session, tasklist):
         dir_paths = [
             re.sub(r"/{2,}", "/", f"/{item['savepath']}")
@@ -455,13 +1245,7 @@ class Quark:
                 ]
                 if del_list:
                     await self.delete(session, del_list)
-                    recycle_list = await self.recycle_list(session)
-                    record_id_list = [
-                        item["record_id"]
-                        for item in recycle_list
-                        if item["fid"] in del_list
-                    ]
-                    await self.recycle_remove(session, record_id_list)
+                    await self.purge_recycle(session, set(del_list), all_pages=False)
                 return save_file_return
             else:
                 return False
@@ -470,131 +1254,368 @@ class Quark:
                 logger.error(f"转存测试失败: {str(e)}")
             return False
 
-    async def do_save_task(self, session, task):
+    async def plan_task(self, session, task):
+        # 第一阶段：只读地收集任务需要执行的转存、建目录、重命名操作，生成可序列化的计划；
+        # 分享失效、恢复只记录在计划中，由 apply_share_state 写入任务
         if task.get("shareurl_ban"):
-            logger.info(f"《{task['taskname']}》：{task['shareurl_ban']}")
-            return
+            recheck_time = share_recheck_time(task)
+            if time.time() < recheck_time:
+                logger.info(
+                    f"《{task['taskname']}》：{task['shareurl_ban']}，{datetime.fromtimestamp(recheck_time).strftime('%Y-%m-%d %H:%M')} 后重新检查"
+                )
+                return None
+            logger.info(f"《{task['taskname']}》：重新检查失效分享")
 
         pwd_id, pdir_fid = self.get_id_from_url(task["shareurl"])
         is_sharing, stoken = await self.get_stoken(session, pwd_id)
+        pattern, replace = magic_regex_func(task["pattern"], task["replace"])
+        plan = {
+            "taskname": task["taskname"],
+            "savepath": task["savepath"],
+            "pwd_id": pwd_id,
+            "stoken": stoken if is_sharing else "",
+            "pattern": pattern,
+            "replace": replace,
+            "ban": None if is_sharing else stoken,
+            "unban": False,
+            "mkdirs": [],
+            "saves": [],
+            "renames": [],
+            "rename_paths": [re.sub(r"/{2,}", "/", f"/{task['savepath']}")],
+            "rename_recursive": True,
+            "duplicates": [],
+        }
         if not is_sharing:
-            add_notify(f"❌《{task['taskname']}》：{stoken}\n")
-            task["shareurl_ban"] = stoken
-            return
-        updated_tree = await self.dir_check_and_save(session, task, pwd_id, stoken, pdir_fid)
-        if updated_tree.size(1) > 0:
-            add_notify(f"✅《{task['taskname']}》添加追更：\n{updated_tree}")
-            return True
-        else:
-            logger.info(f"任务结束：没有新的转存任务")
-            return False
+            return plan
+        await self.plan_dir(session, task, plan, pdir_fid)
+        plan["renames"] = await self.plan_task_renames(session, plan)
+        return plan
 
-    async def dir_check_and_save(self, session, task, pwd_id, stoken, pdir_fid="", subdir_path=""):
-        tree = Tree()
-        tree.create_node(task["savepath"], pdir_fid)
-        share_file_list = await self.get_detail(session, pwd_id, stoken, pdir_fid)
+    async def plan_dir(self, session, task, plan, pdir_fid="", subdir_path=""):
+        share_file_list = await self.get_detail(session, plan["pwd_id"], plan["stoken"], pdir_fid)
+
+        if share_file_list and subdir_path == "" and task.get("shareurl_ban"):
+            plan["unban"] = True
 
         if not share_file_list:
             if subdir_path == "":
-                task["shareurl_ban"] = "分享为空，文件已被分享者删除"
-                add_notify(f"《{task['taskname']}》：{task['shareurl_ban']}")
-            return tree
+                plan["ban"] = "分享为空，文件已被分享者删除"
+            return
         elif (
             len(share_file_list) == 1
             and share_file_list[0]["dir"]
             and subdir_path == ""
         ):
             logger.info("🧠 该分享是一个文件夹，读取文件夹内列表")
-            share_file_list = await self.get_detail(session, pwd_id, stoken, share_file_list[0]["fid"])
+            share_file_list = await self.get_detail(session, plan["pwd_id"], plan["stoken"], share_file_list[0]["fid"])
 
         savepath = re.sub(r"/{2,}", "/", f"/{task['savepath']}{subdir_path}")
         if not self.savepath_fid.get(savepath):
             get_fids = await self.get_fids(session, (savepath,))
             if get_fids:
                 self.savepath_fid[savepath] = get_fids[0]["fid"]
+            elif subdir_path == "":
+                # 目标目录不存在，执行阶段先创建
+                plan["mkdirs"].append(savepath)
             else:
                 logger.error(f"❌ 目录 {savepath} fid获取失败，跳过转存")
-                return tree
-        to_pdir_fid = self.savepath_fid[savepath]
-        dir_file_list = await self.ls_dir(session, to_pdir_fid)
+                return
+
+        # 开启分桶时，根目录下的文件按桶存入子目录，只列出涉及的桶目录
+        bucket = task.get("bucket") if subdir_path == "" else None
+        if bucket and not parse_bucket(bucket):
+            logger.error(f"《{task['taskname']}》分桶设置无效：{bucket}，文件存入目标目录")
+            bucket = None
 
-        need_save_list = []
+        def target_of(share_file, save_name):
+            name = bucket_name(bucket, save_name) if bucket and not share_file["dir"] else None
+            if name:
+                return f"{savepath.rstrip('/')}/{name}", f"{subdir_path}/{name}"
+            return savepath, subdir_path
+
+        candidates = []
         for share_file in share_file_list:
             if share_file["dir"] and task.get("update_subdir", False):
                 pattern, replace = task["update_subdir"], ""
             else:
-                pattern, replace = magic_regex_func(task["pattern"], task["replace"])
+                pattern, replace = plan["pattern"], plan["replace"]
             if re.search(pattern, share_file["file_name"]):
                 save_name = (
                     re.sub(pattern, replace, share_file["file_name"])
                     if replace != ""
                     else share_file["file_name"]
                 )
-                if task.get("ignore_extension") and not share_file["dir"]:
-                    compare_func = lambda a, b1, b2: (
-                        os.path.splitext(a)[0] == os.path.splitext(b1)[0]
-                        or os.path.splitext(a)[0] == os.path.splitext(b2)[0]
+                candidates.append((share_file, save_name, *target_of(share_file, save_name)))
+            if share_file["fid"] == task.get("startfid", ""):
+                break
+
+        targets = list(dict.fromkeys(target for _, _, target, _ in candidates))
+        # 开启分桶前已存入目标目录根目录的文件同样视为已转存
+        listed = targets + [savepath] if bucket and savepath not in targets else targets
+        listings = {path: [] for path in listed if path in plan["mkdirs"]}
+        unknown = [path for path in listed if path not in listings and not self.savepath_fid.get(path)]
+        if unknown:
+            for item in await self.get_fids(session, unknown):
+                self.savepath_fid[item["file_path"]] = item["fid"]
+        for path in listed:
+            if path not in listings and not self.savepath_fid.get(path):
+                # 新的桶目录，执行阶段创建
+                plan["mkdirs"].append(path)
+                listings[path] = []
+        existing = [path for path in listed if path not in listings]
+        for path, file_list in zip(
+            existing,
+            await asyncio.gather(*[self.ls_dir(session, self.savepath_fid[path]) for path in existing]),
+        ):
+            listings[path] = file_list
+        if bucket:
+            # 重命名只检查本次涉及的目录，不再递归整个目标目录
+            plan["rename_paths"] = targets
+            plan["rename_recursive"] = False
+
+        for share_file, save_name, target, target_subdir in candidates:
+            if task.get("ignore_extension") and not share_file["dir"]:
+                compare_func = lambda a, b1, b2: (
+                    os.path.splitext(a)[0] == os.path.splitext(b1)[0]
+                    or os.path.splitext(a)[0] == os.path.splitext(b2)[0]
+                )
+            else:
+                compare_func = lambda a, b1, b2: (a == b1 or a == b2)
+            file_exists = any(
+                compare_func(
+                    dir_file["file_name"], share_file["file_name"], save_name
+                )
+                for dir_file in listings[target] + (listings[savepath] if target != savepath else [])
+            )
+            if not file_exists:
+                item = {
+                    "savepath": target,
+                    "subdir": target_subdir,
+                    "fid": share_file["fid"],
+                    "share_fid_token": share_file["share_fid_token"],
+                    "file_name": share_file["file_name"],
+                    "save_name": save_name,
+                    "dir": share_file["dir"],
+                    "obj_category": share_file.get("obj_category", ""),
+                    "size": share_file.get("size", 0),
+                }
+                duplicate = self.saved_index.find(item) if self.saved_index else None
+                if duplicate:
+                    plan["duplicates"].append(
+                        {
+                            **item,
+                            "saved_fid": duplicate["fid"],
+                            "saved_in": duplicate["savepath"],
+                            "saved_by": duplicate["taskname"],
+                        }
                     )
-                else:
-                    compare_func = lambda a, b1, b2: (a == b1 or a == b2)
-                file_exists = any(
-                    compare_func(
-                        dir_file["file_name"], share_file["file_name"], save_name
+                if not duplicate or CONFIG_DATA.get("dedupe") != "skip":
+                    plan["saves"].append(item)
+            elif share_file["dir"]:
+                if task.get("update_subdir", False):
+                    logger.info(f"检查子文件夹：{savepath}/{share_file['file_name']}")
+                    await self.plan_dir(
+                        session,
+                        task,
+                        plan,
+                        share_file["fid"],
+                        f"{subdir_path}/{share_file['file_name']}",
                     )
-                    for dir_file in dir_file_list
-                )
-                if not file_exists:
-                    share_file["save_name"] = save_name
-                    need_save_list.append(share_file)
-                elif share_file["dir"]:
-                    if task.get("update_subdir", False):
-                        logger.info(f"检查子文件夹：{savepath}/{share_file['file_name']}")
-                        subdir_tree = await self.dir_check_and_save(
+
+    async def plan_task_renames(self, session, plan):
+        renames = []
+        for path in plan["rename_paths"]:
+            renames += await self.plan_renames(session, plan["pattern"], plan["replace"], path, plan["rename_recursive"])
+        return renames
+
+    async def plan_renames(self, session, pattern, replace, savepath, recursive=True):
+        if not pattern or not replace:
+            return []
+        if not self.savepath_fid.get(savepath):
+            fids = await self.get_fids(session, (savepath,))
+            if fids:
+                self.savepath_fid[savepath] = fids[0]["fid"]
+            else:
+                return []
+        dir_file_list = await self.ls_dir(session, self.savepath_fid[savepath])
+        dir_file_name_list = [item["file_name"] for item in dir_file_list]
+        renames = []
+        subdir_tasks = []
+        for dir_file in dir_file_list:
+            if dir_file["dir"] and recursive:
+                subdir_tasks.append(self.plan_renames(session, pattern, replace, f"{savepath}/{dir_file['file_name']}"))
+            if re.search(pattern, dir_file["file_name"]):
+                save_name = re.sub(pattern, replace, dir_file["file_name"])
+                if save_name != dir_file["file_name"] and (
+                    save_name not in dir_file_name_list
+                ):
+                    renames.append(
+                        {
+                            "savepath": savepath,
+                            "fid": dir_file["fid"],
+                            "file_name": dir_file["file_name"],
+                            "save_name": save_name,
+                        }
+                    )
+        for subdir_renames in await asyncio.gather(*subdir_tasks):
+            renames += subdir_renames
+        return renames
+
+    async def execute_plans(self, session, plans):
+        # 第二阶段：按 建目录 → 转存 → 等待转存结果 → 重命名 的顺序批量执行，同一分享同一目标目录的转存合并提交
+        # changes: 网盘中新增或删除的文件路径，用于按路径通知媒体库
+        # errors: 转存失败的消息，在各任务结束时发出
+        results = [{"saved": [], "renamed": 0, "deferred": [], "changes": [], "errors": []} for _ in plans]
+        semaphore = asyncio.Semaphore(EXECUTE_CONCURRENCY)
+
+        async def limited(coro):
+            async with semaphore:
+                return await coro
+
+        mkdirs = sorted(
+            {path for plan in plans for path in plan["mkdirs"]} - set(self.savepath_fid)
+        )
+        mkdir_results = await asyncio.gather(*[limited(self.mkdir(session, path)) for path in mkdirs])
+        for dir_path, mkdir_return in zip(mkdirs, mkdir_results):
+            if mkdir_return and mkdir_return.get("code") == 0:
+                self.savepath_fid[dir_path] = mkdir_return["data"]["fid"]
+                logger.info(f"创建文件夹：{dir_path}")
+            else:
+                logger.error(f"创建文件夹：{dir_path} 失败, {mkdir_return['message'] if mkdir_return else '无响应'}")
+
+        groups = {}
+        for plan_index, plan in enumerate(plans):
+            for item in plan["saves"]:
+                key = (plan["pwd_id"], plan["stoken"], item["savepath"])
+                groups.setdefault(key, []).append((plan_index, item))
+        group_keys = [key for key in groups if self.savepath_fid.get(key[2])]
+        for key in set(groups) - set(group_keys):
+            for plan_index in sorted({plan_index for plan_index, _ in groups[key]}):
+                results[plan_index]["errors"].append(f"❌《{plans[plan_index]['taskname']}》转存失败：目录 {key[2]} 不存在\n")
+
+        def defer(key):
+            for plan_index, item in groups[key]:
+                results[plan_index]["deferred"].append(item)
+
+        def group_size(key):
+            return sum(item["size"] for _, item in groups[key])
+
+        def size_known(key):
+            # 分享列表中文件夹的大小为 0，实际大小未知
+            return not any(item["dir"] for _, item in groups[key])
+
+        def submit(keys):
+            return asyncio.gather(
+                *[
+                    limited(
+                        self.save_file(
                             session,
-                            task,
-                            pwd_id,
-                            stoken,
-                            share_file["fid"],
-                            f"{subdir_path}/{share_file['file_name']}",
+                            [item["fid"] for _, item in groups[key]],
+                            [item["share_fid_token"] for _, item in groups[key]],
+                            self.savepath_fid[key[2]],
+                            key[0],
+                            key[1],
                         )
-                        if subdir_tree.size(1) > 0:
-                            tree.create_node(
-                                "📁" + share_file["file_name"],
-                                share_file["fid"],
-                                parent=pdir_fid,
-                            )
-                            tree.merge(share_file["fid"], subdir_tree, deep=False)
-            if share_file["fid"] == task.get("startfid", ""):
-                break
+                    )
+                    for key in keys
+                ]
+            )
 
-        fid_list = [item["fid"] for item in need_save_list]
-        fid_token_list = [item["share_fid_token"] for item in need_save_list]
-        save_name_list = [item["save_name"] for item in need_save_list]
-        if fid_list:
-            save_file_return = await self.save_file(session, fid_list, fid_token_list, to_pdir_fid, pwd_id, stoken)
-            err_msg = None
-            if save_file_return and save_file_return.get("code") == 0:
-                task_id = save_file_return["data"]["task_id"]
-                query_task_return = await self.query_task(session, task_id)
-                if query_task_return and query_task_return.get("code") == 0:
-                    save_name_list.sort()
-                    for item in need_save_list:
-                        icon = (
-                            "📁"
-                            if item["dir"] == True
-                            else "🎞️" if item["obj_category"] == "video" else ""
-                        )
-                        tree.create_node(
-                            f"{icon}{item['save_name']}", item["fid"], parent=pdir_fid
-                        )
+        if self.free_capacity is not None:
+            # 按分享列表中的文件大小预估，放不下的转存不再提交，顺延到下次运行；
+            # 含文件夹的转存无法预估，直接提交，由转存结果判断容量是否足够
+            remaining = self.free_capacity
+            fit_keys = []
+            for key in group_keys:
+                if not size_known(key):
+                    fit_keys.append(key)
+                elif group_size(key) > remaining:
+                    defer(key)
                 else:
-                    err_msg = query_task_return["message"] if query_task_return else "无响应"
+                    remaining -= group_size(key)
+                    fit_keys.append(key)
+            group_keys = fit_keys
+        save_results = dict(zip(group_keys, await submit(group_keys)))
+        missing = [key for key in group_keys if is_not_found_error(save_results[key])]
+        if missing:
+            # 缓存的目录fid已失效（目录在网盘中被删除或重建）：清除缓存，重新获取或创建目录后再转存一次
+            paths = sorted({key[2] for key in missing})
+            for path in paths:
+                logger.info(f"目录 {path} 已不存在，重新获取")
+                self.forget_dir(path)
+            for item in await self.get_fids(session, paths):
+                self.savepath_fid[item["file_path"]] = item["fid"]
+            for path in paths:
+                if not self.savepath_fid.get(path):
+                    mkdir_return = await self.mkdir(session, path)
+                    if mkdir_return and mkdir_return.get("code") == 0:
+                        self.savepath_fid[path] = mkdir_return["data"]["fid"]
+                        logger.info(f"创建文件夹：{path}")
+            retry_keys = [key for key in missing if self.savepath_fid.get(key[2])]
+            save_results.update(zip(retry_keys, await submit(retry_keys)))
+        query_keys = []
+        query_tasks = []
+        errors = {}
+        for key, save_file_return in save_results.items():
+            if save_file_return and save_file_return.get("code") == 0:
+                query_keys.append(key)
+                query_tasks.append(limited(self.query_task(session, save_file_return["data"]["task_id"])))
+            elif is_capacity_error(save_file_return):
+                self.free_capacity = 0
+                defer(key)
             else:
-                err_msg = save_file_return["message"] if save_file_return else "无响应"
+                errors[key] = save_file_return["message"] if save_file_return else "无响应"
+        query_results = await asyncio.gather(*query_tasks)
+        unknown_saved = False
+        for key, query_task_return in zip(query_keys, query_results):
+            if query_task_return and query_task_return.get("code") == 0:
+                for plan_index, item in groups[key]:
+                    results[plan_index]["saved"].append(item)
+                    results[plan_index]["changes"].append(
+                        {"path": f"{item['savepath']}/{item['save_name']}", "type": "Created"}
+                    )
+                if not size_known(key):
+                    unknown_saved = True
+                elif self.free_capacity is not None:
+                    self.free_capacity = max(self.free_capacity - group_size(key), 0)
+            elif is_capacity_error(query_task_return):
+                self.free_capacity = 0
+                defer(key)
+            else:
+                errors[key] = query_task_return["message"] if query_task_return else "无响应"
+        if unknown_saved and self.free_capacity:
+            # 转存了文件夹，重新获取剩余空间，获取失败时不再预估
+            self.free_capacity = None
+            self.set_capacity(await self.get_member_info(session))
+        for key, err_msg in errors.items():
+            for plan_index in sorted({plan_index for plan_index, _ in groups[key]}):
+                results[plan_index]["errors"].append(f"❌《{plans[plan_index]['taskname']}》转存失败：{err_msg}\n")
 
-            if err_msg:
-                add_notify(f"❌《{task['taskname']}》转存失败：{err_msg}\n")
-        return tree
+        # 有新转存的任务重新生成重命名列表，覆盖新转存的文件
+        rename_plans = await asyncio.gather(
+            *[
+                self.plan_task_renames(session, plan)
+                if result["saved"]
+                else asyncio.sleep(0, plan["renames"])
+                for plan, result in zip(plans, results)
+            ]
+        )
+        rename_items = [
+            (plan_index, item)
+            for plan_index, renames in enumerate(rename_plans)
+            for item in renames
+        ]
+        rename_results = await asyncio.gather(
+            *[limited(self.rename(session, item["fid"], item["save_name"])) for _, item in rename_items]
+        )
+        for (plan_index, item), rename_return in zip(rename_items, rename_results):
+            if rename_return and rename_return.get("code") == 0:
+                results[plan_index]["renamed"] += 1
+                results[plan_index]["changes"] += [
+                    {"path": f"{item['savepath']}/{item['file_name']}", "type": "Deleted"},
+                    {"path": f"{item['savepath']}/{item['save_name']}", "type": "Created"},
+                ]
+        return results
 
     async def query_task(self, session, task_id):
         retry_index = 0
@@ -625,42 +1646,16 @@ class Quark:
                 break
         return response
 
-    async def do_rename_task(self, session, task, subdir_path=""):
-        pattern, replace = magic_regex_func(task["pattern"], task["replace"])
-        if not pattern or not replace:
-            return False
-        savepath = re.sub(r"/{2,}", "/", f"/{task['savepath']}{subdir_path}")
-        if not self.savepath_fid.get(savepath):
-            fids = await self.get_fids(session, (savepath,))
-            if fids:
-                self.savepath_fid[savepath] = fids[0]["fid"]
-            else:
-                return False
-        dir_file_list = await self.ls_dir(session, self.savepath_fid[savepath])
-        dir_file_name_list = [item["file_name"] for item in dir_file_list]
-        rename_tasks = []
-        for dir_file in dir_file_list:
-            if dir_file["dir"]:
-                rename_tasks.append(self.do_rename_task(session, task, f"{subdir_path}/{dir_file['file_name']}"))
-            if re.search(pattern, dir_file["file_name"]):
-                save_name = (
-                    re.sub(pattern, replace, dir_file["file_name"])
-                    if replace != ""
-                    else dir_file["file_name"]
-                )
-                if save_name != dir_file["file_name"] and (
-                    save_name not in dir_file_name_list
-                ):
-                    rename_tasks.append(self.rename(session, dir_file["fid"], save_name))
-        rename_results = await asyncio.gather(*rename_tasks)
-        is_rename = any(rename_results)
-        return is_rename
-
-async def verify_account(session, account):
+async def verify_account(session, account, warm_cache=None):
     logger.info(f"▶️ 验证第{account.index}个账号")
     if "__uid" not in account.cookie:
         logger.info(f"💡 不存在cookie必要参数，判断为仅签到")
         return False
+    elif warm_cache and account.cookie in warm_cache.data.get("accounts", {}):
+        account.is_active = True
+        account.nickname = warm_cache.data["accounts"][account.cookie]
+        logger.info(f"👤 账号昵称: {account.nickname}✅（已预热）")
+        return True
     else:
         account_info = await account.init(session)
         if not account_info:
@@ -670,6 +1665,17 @@ async def verify_account(session, account):
             logger.info(f"👤 账号昵称: {account_info['nickname']}✅")
             return True
 
+def is_capacity_error(response):
+    return bool(response) and (
+        response.get("code") == CAPACITY_ERROR_CODE
+        or any(message in str(response.get("message", "")).lower() for message in CAPACITY_ERROR_MESSAGES)
+    )
+
+def is_not_found_error(response):
+    return bool(response) and response.get("code") != 0 and any(
+        message in str(response.get("message", "")).lower() for message in NOT_FOUND_MESSAGES
+    )
+
 def format_bytes(size_bytes: int) -> str:
     units = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
     i = 0
@@ -683,6 +1689,7 @@ async def do_sign(session, account):
         logger.info("⏭️ 移动端参数未设置，跳过签到")
         return
     growth_info = await account.get_growth_info(session)
+    account.set_capacity(growth_info)
     if growth_info:
         growth_message = f"💾 {'88VIP' if growth_info['88VIP'] else '普通用户'} 总空间：{format_bytes(growth_info['total_capacity'])}，签到累计获得：{format_bytes(growth_info['cap_composition'].get('sign_reward', 0))}"
         if growth_info["cap_sign"]["sign_daily"]:
@@ -705,13 +1712,144 @@ async def do_sign(session, account):
             else:
                 logger.error(f"📅 签到异常: {sign_return}")
 
-async def do_save(session, account, tasklist=[]):
+async def do_purge_recycle(session, account, purge_all=False):
+    if purge_all:
+        logger.info(f"🗑️ 清空回收站: {account.nickname}")
+        removed = await account.purge_recycle(session)
+    else:
+        # 默认只清理本程序删除的文件
+        fids = account.recycle_ledger.load() if account.recycle_ledger else set()
+        if not fids:
+            logger.info(f"🗑️ {account.nickname} 没有需要清理的回收站记录")
+            return
+        logger.info(f"🗑️ 清理回收站: {account.nickname}，本程序删除的文件 {len(fids)} 个")
+        removed = await account.purge_recycle(session, fids)
+    logger.info(f"🗑️ 已清理回收站记录: {removed} 条")
+
+async def warm_up(session, account, tasklist):
+    # 预先获取目录fid、同步镜像、获取各分享的 stoken 与文件列表，正式运行直接使用
+    tasklist = [
+        task
+        for task in tasklist
+        if (not task.get("enddate") or datetime.now().date() <= datetime.strptime(task["enddate"], "%Y-%m-%d").date())
+        and not (task.get("shareurl_ban") and time.time() < share_recheck_time(task))
+    ]
+    if account.mirror:
+        await account.sync_mirror(session, tasklist)
+    await account.get_fids(session, list({re.sub(r"/{2,}", "/", f"/{task['savepath']}") for task in tasklist}))
+    semaphore = asyncio.Semaphore(PLAN_CONCURRENCY)
+
+    async def probe(task):
+        async with semaphore:
+            pwd_id, pdir_fid = account.get_id_from_url(task["shareurl"])
+            is_sharing, stoken = await account.get_stoken(session, pwd_id)
+            account.stoken_cache[pwd_id] = [is_sharing, stoken]
+            if not is_sharing:
+                return
+            share_file_list = await account.get_detail(session, pwd_id, stoken, pdir_fid)
+            account.detail_cache[f"{pwd_id}/{pdir_fid}"] = share_file_list
+            if len(share_file_list) == 1 and share_file_list[0]["dir"]:
+                fid = share_file_list[0]["fid"]
+                account.detail_cache[f"{pwd_id}/{fid}"] = await account.get_detail(session, pwd_id, stoken, fid)
+
+    await asyncio.gather(*[probe(task) for task in tasklist])
+    account.warmed = True
+    logger.info(f"🔥 预热完成：{len(account.stoken_cache)} 个分享，{len(account.savepath_fid)} 个目录")
+
+def log_task(index, task):
+    logger.info(f"#{index+1}------------------")
+    logger.info(f"任务名称: {task['taskname']}")
+    logger.info(f"分享链接: {task['shareurl']}")
+    logger.info(f"目标目录: {task['savepath']}")
+    logger.info(f"正则匹配: {task['pattern']}")
+    logger.info(f"正则替换: {task['replace']}")
+    if task.get("enddate"):
+        logger.info(f"任务截止: {task['enddate']}")
+    if task.get("emby_id"):
+        logger.info(f"刷媒体库: {task['emby_id']}")
+    if task.get("ignore_extension"):
+        logger.info(f"忽略后缀: {task['ignore_extension']}")
+    if task.get("update_subdir"):
+        logger.info(f"更子目录: {task['update_subdir']}")
+
+def build_tree(savepath, saved):
+    tree = Tree()
+    tree.create_node(savepath, "root")
+    for item in saved:
+        parent = "root"
+        for name in filter(None, item["subdir"].split("/")):
+            node_id = f"{parent}/{name}"
+            if not tree.contains(node_id):
+                tree.create_node("📁" + name, node_id, parent=parent)
+            parent = node_id
+        icon = (
+            "📁"
+            if item["dir"] == True
+            else "🎞️" if item["obj_category"] == "video" else ""
+        )
+        tree.create_node(f"{icon}{item['save_name']}", item["fid"], parent=parent)
+    return tree
+
+async def finish_task(session, account, emby, task, plan, result, stats):
+    is_new = bool(result and result["saved"])
+    is_rename = bool(result and result["renamed"])
+    deferred = result["deferred"] if result else []
+    if plan:
+        apply_share_state(task, plan)
+    for message in result["errors"] if result else []:
+        add_notify(message)
+    if is_new:
+        add_notify(f"✅《{task['taskname']}》添加追更：\n{build_tree(task['savepath'], result['saved'])}")
+        stats["updated"] += 1
+    elif plan and not plan["ban"] and not deferred:
+        logger.info(f"《{task['taskname']}》任务结束：没有新的转存任务")
+    if deferred:
+        # 空间不足未转存的文件下次运行优先处理，不更新轮询记录
+        logger.info(f"💾《{task['taskname']}》空间不足，{len(deferred)} 个文件顺延到下次运行")
+        task["carried"] = True
+        stats["deferred"].append(
+            {"taskname": task["taskname"], "count": len(deferred), "size": sum(item["size"] for item in deferred)}
+        )
+    else:
+        record_poll(task, is_new)
+        task.pop("carried", None)
+    saved_index = account.saved_index
+    if saved_index and plan:
+        skip = CONFIG_DATA.get("dedupe") == "skip"
+        for duplicate in plan["duplicates"]:
+            if saved_index.mark_duplicate(duplicate):
+                logger.info(
+                    f"♻️《{task['taskname']}》{duplicate['file_name']} 已由《{duplicate['saved_by']}》转存到 {duplicate['saved_in']}"
+                    + ("，跳过" if skip else "")
+                )
+                stats["duplicates"].append(
+                    {
+                        "taskname": task["taskname"],
+                        "file_name": duplicate["file_name"],
+                        "saved_in": duplicate["saved_in"],
+                        "size": duplicate["size"],
+                        "skipped": skip,
+                    }
+                )
+        for item in result["saved"] if result else []:
+            saved_index.add(task, item)
+    if emby.is_active and (is_new or is_rename) and task.get("emby_id") != "0":
+        # 刷新媒体库放入队列，不阻塞下一个任务
+        emby.queue(session, task, result["changes"])
+
+async def do_save(session, account, tasklist=[], journal=None, force=False, deadline=None, pipeline=False, plan_only=False):
     emby = Emby(
         CONFIG_DATA.get("emby", {}).get("url", ""),
         CONFIG_DATA.get("emby", {}).get("apikey", ""),
+        account.emby_cache,
     )
     logger.info(f"转存账号: {account.nickname}")
-    await account.update_savepath_fid(session, tasklist)
+    if account.mirror and not account.mirror.validated:
+        await account.sync_mirror(session, tasklist)
+    if not plan_only:
+        await account.update_savepath_fid(session, tasklist)
+        await account.update_capacity(session)
+        await emby.init(session)
 
     def check_date(task):
         return (
@@ -722,79 +1860,281 @@ async def do_save(session, account, tasklist=[]):
             )
         )
 
-    tasks = []
-    for index, task in enumerate(tasklist):
-        if check_date(task):
-            logger.info(f"#{index+1}------------------")
-            logger.info(f"任务名称: {task['taskname']}")
-            logger.info(f"分享链接: {task['shareurl']}")
-            logger.info(f"目标目录: {task['savepath']}")
-            logger.info(f"正则匹配: {task['pattern']}")
-            logger.info(f"正则替换: {task['replace']}")
-            if task.get("enddate"):
-                logger.info(f"任务截止: {task['enddate']}")
-            if task.get("emby_id"):
-                logger.info(f"刷媒体库: {task['emby_id']}")
-            if task.get("ignore_extension"):
-                logger.info(f"忽略后缀: {task['ignore_extension']}")
-            if task.get("update_subdir"):
-                logger.info(f"更子目录: {task['update_subdir']}")
-            is_new = await account.do_save_task(session, task)
-            is_rename = await account.do_rename_task(session, task)
-            if emby.is_active and (is_new or is_rename) and task.get("emby_id") != "0":
-                if task.get("emby_id"):
-                    await emby.refresh(session, task["emby_id"])
-                else:
-                    match_emby_id = await emby.search(session, task["taskname"])
-                    if match_emby_id:
-                        task["emby_id"] = match_emby_id
-                        await emby.refresh(session, match_emby_id)
+    adaptive_poll = CONFIG_DATA.get("adaptive_poll") and not force
+    stats = {"checked": 0, "updated": 0, "carried": 0, "deferred": [], "duplicates": []}
+
+    def select_tasks():
+        # 逐个产出本次需要执行的任务，时间预算在取下一个任务时检查
+        for index, task in order_tasks(tasklist, prioritize=bool(deadline)):
+            if journal and journal.restore(task):
+                logger.info(f"#{index+1} 《{task['taskname']}》上次运行中已完成，跳过")
+            elif adaptive_poll and check_date(task) and not is_poll_due(task):
+                next_poll = datetime.fromtimestamp(poll_schedule(task)["next_poll"])
+                logger.info(f"#{index+1} 《{task['taskname']}》自适应轮询，下次检查: {next_poll.strftime('%Y-%m-%d %H:%M')}")
+            elif deadline and time.time() >= deadline and check_date(task):
+                # 本次需要执行但超出时间预算，留到下次运行优先执行
+                task["carried"] = True
+                stats["carried"] += 1
+            elif check_date(task):
+                stats["checked"] += 1
+                yield index, task
+
+    carried = set()
+
+    def carry(task):
+        # 已选中但超出时间预算未执行的任务，留到下次运行优先执行
+        task["carried"] = True
+        stats["carried"] += 1
+        stats["checked"] -= 1
+        carried.add(id(task))
+
+    if pipeline or plan_only:
+        # 两阶段：先并发生成全部任务的计划，再统一分阶段执行；每个任务规划前、执行前检查时间预算
+        due_tasks = list(select_tasks())
+        for index, task in due_tasks:
+            log_task(index, task)
+        semaphore = asyncio.Semaphore(PLAN_CONCURRENCY)
+
+        async def plan_task(task):
+            async with semaphore:
+                if deadline and time.time() >= deadline:
+                    carry(task)
+                    return None
+                return await account.plan_task(session, task)
+
+        plans = await asyncio.gather(*[plan_task(task) for _, task in due_tasks])
+        if plan_only:
+            # stoken 为分享的访问凭证，不输出
+            stats["plans"] = [
+                {"index": index, **{key: value for key, value in plan.items() if key != "stoken"}}
+                for (index, _), plan in zip(due_tasks, plans)
+                if plan
+            ]
+            return stats
+        planned = [(task, plan) for (_, task), plan in zip(due_tasks, plans) if plan]
+        if deadline and time.time() >= deadline:
+            for task, _ in planned:
+                carry(task)
+            planned = []
+        results = await account.execute_plans(session, [plan for _, plan in planned])
+        results_map = {id(task): result for (task, _), result in zip(planned, results)}
+        for (_, task), plan in zip(due_tasks, plans):
+            if id(task) in carried:
+                continue
+            notify_start = len(NOTIFYS)
+            await finish_task(session, account, emby, task, plan, results_map.get(id(task)), stats)
+            if journal:
+                journal.checkpoint(task, NOTIFYS[notify_start:])
+    else:
+        for index, task in select_tasks():
+            notify_start = len(NOTIFYS)
+            log_task(index, task)
+            plan = await account.plan_task(session, task)
+            result = (await account.execute_plans(session, [plan]))[0] if plan else None
+            await finish_task(session, account, emby, task, plan, result, stats)
+            if journal:
+                journal.checkpoint(task, NOTIFYS[notify_start:])
+    await emby.drain(session)
+    if stats["carried"]:
+        logger.info(f"⏳ 超出时间预算，{stats['carried']} 个任务顺延到下次运行")
     logger.info("转存任务完成")
+    return stats
+
+def run_shard(config_data, cookie, nickname, savepath_fid, shard, journal=None, deadline=None, pipeline=False, free_capacity=None, saved_index=None, mirror=None, emby_cache=None):
+    # 分片子进程入口：独立的事件循环与连接池，返回通知、任务状态与统计
+    SHARE_CACHE.set(None)
+    # 父进程的流式推送接收端绑定父进程的事件循环，分片的通知由父进程统一推送
+    NOTIFY_SINK.set(None)
+    CONFIG_DATA.bind(config_data)
+    NOTIFYS.clear()
+    account = Quark(cookie, 0)
+    account.is_active = True
+    account.nickname = nickname
+    account.savepath_fid = savepath_fid
+    account.free_capacity = free_capacity
+    account.saved_index = saved_index
+    account.mirror = mirror
+    account.emby_cache = emby_cache
+    tasklist = [task for _, task in shard]
+
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            return await do_save(session, account, tasklist, journal, deadline=deadline, pipeline=pipeline)
+
+    stats = asyncio.run(run())
+    task_states = [
+        (index, {key: task[key] for key in TASK_STATE_KEYS if key in task})
+        for index, task in shard
+    ]
+    return NOTIFYS[:], task_states, stats, saved_index
+
+async def do_save_sharded(session, account, tasklist, shards, journal=None, deadline=None, pipeline=False):
+    # 目录统一在主进程创建，避免多个分片重复创建同名目录
+    if account.mirror:
+        await account.sync_mirror(session, tasklist)
+    await account.update_savepath_fid(session, tasklist)
+    await account.update_capacity(session)
+    shards = min(shards, len(tasklist))
+    # 剩余空间平均分给各分片，避免并行转存超出总容量
+    free_capacity = account.free_capacity // shards if account.free_capacity is not None else None
+    indexed_tasklist = list(enumerate(tasklist))
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=shards) as executor:
+        futures = [
+            loop.run_in_executor(
+                executor,
+                run_shard,
+                CONFIG_DATA.current(),
+                account.cookie,
+                account.nickname,
+                account.savepath_fid,
+                indexed_tasklist[i::shards],
+                journal,
+                deadline,
+                pipeline,
+                free_capacity,
+                account.saved_index,
+                account.mirror,
+                account.emby_cache,
+            )
+            for i in range(shards)
+        ]
+        results = await asyncio.gather(*futures)
+    stats = {"checked": 0, "updated": 0, "carried": 0, "deferred": [], "duplicates": []}
+    sink = NOTIFY_SINK.get()
+    for notifys, task_states, shard_stats, saved_index in results:
+        NOTIFYS.extend(notifys)
+        if sink:
+            for text in notifys:
+                sink.put(text)
+        if saved_index:
+            account.saved_index.merge(saved_index)
+        for index, state in task_states:
+            tasklist[index].pop("carried", None)
+            tasklist[index].update(state)
+        for key in stats:
+            stats[key] += shard_stats[key]
+    return stats
 
 class Emby:
-    def __init__(self, emby_url, emby_apikey):
+    # 媒体库刷新队列：任务结束时只入队，同一项目在一批中只刷新一次，
+    # 最后一次入队后等待一段时间或运行结束时统一并发刷新；名称→ID 的搜索结果缓存到文件。
+    # 配置了 path_map（网盘路径→Emby 中的路径）时只通知变动的文件路径，由 Emby 增量扫描
+    def __init__(self, emby_url, emby_apikey, cache_path=None):
         self.is_active = False
-        if emby_url and emby_apikey:
-            self.emby_url = emby_url
-            self.emby_apikey = emby_apikey
-            # 初始化时不进行请求，需要在异步环境中调用方法
+        self.emby_url = emby_url
+        self.emby_apikey = emby_apikey
+        self.cache_path = cache_path
+        self.search_cache = {}
+        self.pending = []
+        self.flush_timer = None
+        self.flushing = set()
 
-    async def get_info(self, session):
-        url = f"{self.emby_url}/emby/System/Info"
+    async def init(self, session):
+        if self.emby_url and self.emby_apikey:
+            self.is_active = await self.get_info(session)
+            if self.is_active:
+                self.load_cache()
+        return self.is_active
+
+    async def request(self, session, method, path, **kwargs):
+        # 刷新接口返回 204 无内容，只有 JSON 响应才解析
+        url = f"{self.emby_url}/emby/{path}"
         headers = {"X-Emby-Token": self.emby_apikey}
-        response = await fetch(session, "GET", url, headers=headers, params={})
-        if response and "application/json" in response.get("Content-Type", ""):
+        try:
+            async with session.request(
+                method, url, headers=headers, timeout=aiohttp.ClientTimeout(total=EMBY_TIMEOUT), **kwargs
+            ) as response:
+                response.raise_for_status()
+                if "application/json" in response.headers.get("Content-Type", ""):
+                    return await response.json()
+                return {}
+        except Exception as e:
+            logger.error(f"Emby请求失败: {method} {path} - {e}")
+            return None
+
+    def load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                self.search_cache = json.load(file)
+        except Exception as e:
+            logger.error(f"读取Emby缓存失败: {e}")
+
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        # 分片进程各自写回，先合并文件中已有的结果
+        cache = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as file:
+                    cache = json.load(file)
+            except Exception:
+                pass
+        cache.update(self.search_cache)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(cache, file, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    async def get_info(self, session):
+        response = await self.request(session, "GET", "System/Info")
+        if response:
             logger.info(
                 f"Emby媒体库: {response.get('ServerName','')} v{response.get('Version','')}"
             )
             return True
         else:
-            logger.error(f"Emby媒体库: 连接失败❌ {response.text if response else '无响应'}")
+            logger.error(f"Emby媒体库: 连接失败❌")
+            return False
+
+    def map_path(self, path):
+        # 按最长前缀将网盘路径映射为 Emby 中的路径，未映射的返回 None
+        path_map = CONFIG_DATA.get("emby", {}).get("path_map") or {}
+        for src in sorted(path_map, key=len, reverse=True):
+            prefix = src.rstrip("/")
+            if path == prefix or path.startswith(f"{prefix}/"):
+                return path_map[src].rstrip("/") + path[len(prefix):]
+        return None
+
+    async def notify_updated(self, session, updates):
+        response = await self.request(
+            session,
+            "POST",
+            "Library/Media/Updated",
+            json={"Updates": [{"Path": path, "UpdateType": update_type} for path, update_type in updates]},
+        )
+        if response is None:
+            logger.error(f"🎞 通知Emby媒体库变动：{len(updates)} 个路径失败❌")
             return False
+        return True
 
     async def refresh(self, session, emby_id):
         if emby_id:
-            url = f"{self.emby_url}/emby/Items/{emby_id}/Refresh"
-            headers = {"X-Emby-Token": self.emby_apikey}
+            # 默认只扫描新文件并补充缺失的元数据，FullRefresh 会重新获取整部剧集的元数据与图片
+            refresh_mode = CONFIG_DATA.get("emby", {}).get("refresh_mode") or EMBY_REFRESH_MODE
             querystring = {
                 "Recursive": "true",
-                "MetadataRefreshMode": "FullRefresh",
-                "ImageRefreshMode": "FullRefresh",
+                "MetadataRefreshMode": refresh_mode,
+                "ImageRefreshMode": refresh_mode,
                 "ReplaceAllMetadata": "false",
                 "ReplaceAllImages": "false",
             }
-            response = await fetch(session, "POST", url, headers=headers, params=querystring)
-            if response and response.text == "":
-                logger.info(f"🎞 刷新Emby媒体库：成功✅")
+            response = await self.request(session, "POST", f"Items/{emby_id}/Refresh", params=querystring)
+            if response is not None:
+                logger.info(f"🎞 刷新Emby媒体库：{emby_id} 成功✅")
                 return True
             else:
-                logger.error(f"🎞 刷新Emby媒体库：{response.text if response else '无响应'}❌")
+                logger.error(f"🎞 刷新Emby媒体库：{emby_id} 失败❌")
                 return False
 
     async def search(self, session, media_name):
         if media_name:
-            url = f"{self.emby_url}/emby/Items"
-            headers = {"X-Emby-Token": self.emby_apikey}
+            cached = self.search_cache.get(media_name)
+            if cached and (cached["id"] or time.time() - cached["time"] < EMBY_SEARCH_MISS_TTL):
+                return cached["id"] or False
             querystring = {
                 "IncludeItemTypes": "Series",
                 "StartIndex": 0,
@@ -806,27 +2146,518 @@ class Emby:
                 "Limit": 10,
                 "IncludeSearchTypes": "false",
             }
-            response = await fetch(session, "GET", url, headers=headers, params=querystring)
-            if response and "application/json" in response.get("Content-Type", ""):
-                if response.get("Items"):
-                    for item in response["Items"]:
-                        if item["IsFolder"]:
-                            logger.info(
-                                f"🎞 《{item['Name']}》匹配到Emby媒体库ID：{item['Id']}"
-                            )
-                            return item["Id"]
+            response = await self.request(session, "GET", "Items", params=querystring)
+            if response is None:
+                logger.error(f"🎞 搜索Emby媒体库：《{media_name}》失败❌")
+                return False
+            match_id = ""
+            for item in response.get("Items") or []:
+                if item["IsFolder"]:
+                    logger.info(
+                        f"🎞 《{item['Name']}》匹配到Emby媒体库ID：{item['Id']}"
+                    )
+                    match_id = item["Id"]
+                    break
+            self.search_cache[media_name] = {"id": match_id, "time": int(time.time())}
+            return match_id or False
+        return False
+
+    def queue(self, session, task, changes=()):
+        self.pending.append((task, changes))
+        debounce = CONFIG_DATA.get("emby", {}).get("debounce", EMBY_DEBOUNCE)
+        if debounce:
+            if self.flush_timer:
+                self.flush_timer.cancel()
+            self.flush_timer = asyncio.create_task(self.debounce(session, debounce))
+
+    async def debounce(self, session, delay):
+        await asyncio.sleep(delay)
+        self.flush_timer = None
+        task = asyncio.current_task()
+        self.flushing.add(task)
+        try:
+            await self.flush(session)
+        finally:
+            self.flushing.discard(task)
+
+    async def flush(self, session):
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        updates = {}
+        tasks = []
+        for task, changes in pending:
+            mapped = [(self.map_path(change["path"]), change["type"]) for change in changes]
+            if mapped and all(path for path, _ in mapped):
+                updates.update(mapped)
             else:
-                logger.error(f"🎞 搜索Emby媒体库：{response.text if response else '无响应'}❌")
+                # 有路径未配置映射时退回刷新整个项目
+                tasks.append(task)
+        semaphore = asyncio.Semaphore(EMBY_CONCURRENCY)
+
+        async def notify_updated(batch):
+            async with semaphore:
+                return await self.notify_updated(session, batch)
+
+        if updates:
+            updates = list(updates.items())
+            batches = [updates[i : i + EMBY_UPDATE_BATCH] for i in range(0, len(updates), EMBY_UPDATE_BATCH)]
+            results = await asyncio.gather(*[notify_updated(batch) for batch in batches])
+            notified = sum(len(batch) for batch, ok in zip(batches, results) if ok)
+            logger.info(f"🎞 通知Emby媒体库变动 {notified}/{len(updates)} 个路径")
+        if not tasks:
+            return
+
+        async def resolve(task):
+            if not task.get("emby_id"):
+                async with semaphore:
+                    match_emby_id = await self.search(session, task["taskname"])
+                if match_emby_id:
+                    task["emby_id"] = match_emby_id
+
+        async def refresh(emby_id):
+            async with semaphore:
+                return await self.refresh(session, emby_id)
+
+        await asyncio.gather(*[resolve(task) for task in tasks])
+        emby_ids = list(dict.fromkeys(task["emby_id"] for task in tasks if task.get("emby_id")))
+        results = await asyncio.gather(*[refresh(emby_id) for emby_id in emby_ids])
+        logger.info(f"🎞 Emby媒体库刷新 {sum(results)}/{len(emby_ids)} 个项目（{len(tasks)} 个任务）")
+        self.save_cache()
+
+    async def drain(self, session):
+        # 运行结束：取消等待中的定时器，等进行中的刷新完成后刷新剩余项目
+        if self.flush_timer:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        if self.flushing:
+            await asyncio.gather(*self.flushing)
+        await self.flush(session)
+
+def cron_value(value, names=None):
+    return names[value] if names and value in names else int(value)
+
+def parse_cron_field(field, low, high, names=None):
+    # 支持 *、?、列表、范围、步长，以及月份、星期的英文缩写（如 mon-fri、jan）
+    values = set()
+    for part in field.lower().split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+        if part in ("*", "?"):
+            start, end = low, high
+        elif "-" in part:
+            start, end = (cron_value(value, names) for value in part.split("-"))
+        else:
+            start = cron_value(part, names)
+            end = high if step > 1 else start
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"无效的 crontab 字段: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+def crontab_next(crontab, after=None):
+    # 计算 crontab 表达式（分 时 日 月 周）在 after 之后的下一次触发时间
+    minute, hour, day, month, weekday = crontab.split()
+    minutes = parse_cron_field(minute, 0, 59)
+    hours = parse_cron_field(hour, 0, 23)
+    days = parse_cron_field(day, 1, 31)
+    months = parse_cron_field(month, 1, 12, CRON_MONTHS)
+    weekdays = {w % 7 for w in parse_cron_field(weekday, 0, 7, CRON_WEEKDAYS)}
+    after = (after or datetime.now()).replace(second=0, microsecond=0)
+    date = after.date()
+    for _ in range(366 * 5):
+        day_match = date.day in days
+        weekday_match = (date.weekday() + 1) % 7 in weekdays
+        if day not in ("*", "?") and weekday not in ("*", "?"):
+            day_ok = day_match or weekday_match
+        else:
+            day_ok = day_match and weekday_match
+        if date.month in months and day_ok:
+            for h in sorted(hours):
+                for m in sorted(minutes):
+                    fire_time = datetime(date.year, date.month, date.day, h, m)
+                    if fire_time > after:
+                        return fire_time
+        date += timedelta(days=1)
+    return None
+
+def next_fire_time(crontab):
+    # 定时规则无效或不会再触发（如 2 月 30 日）时记录错误并返回 None
+    try:
+        fire_time = crontab_next(crontab)
+    except (ValueError, AttributeError):
+        fire_time = None
+    if fire_time is None:
+        logger.error(f"⏰ 定时规则无效或不会触发: {crontab}，已跳过")
+    return fire_time
+
+def task_crontabs(tasklist, crontab):
+    # 按任务单独设置的 crontab 分组，返回 {crontab: [任务序号]}；没有任务时仍按全局 crontab 签到
+    groups = {}
+    for index, task in enumerate(tasklist):
+        groups.setdefault(task.get("crontab") or crontab, []).append(index)
+    return groups or {crontab: []}
+
+def load_config(config_path):
+    config_store = ConfigStore(config_path)
+    CONFIG_DATA.bind(config_store.read())
+    CONFIG_STORE.set(config_store)
+    if not CONFIG_DATA.get("magic_regex"):
+        CONFIG_DATA["magic_regex"] = MAGIC_REGEX
+    old_store = STATE_STORE.get()
+    if old_store:
+        old_store.close()
+    store = StateStore(state_path(config_path, "state.db"))
+    store.apply(CONFIG_DATA.get("tasklist", []))
+    STATE_STORE.set(store)
+    return CONFIG_DATA.current()
+
+def save_config(config_path):
+    # 写入了配置文件且没有合并其他进程（如 Web 端）的修改时返回 True
+    store = STATE_STORE.get()
+    changed = store.save(CONFIG_DATA.get("tasklist", []))
+    if changed:
+        logger.info(f"💾 更新任务状态: {changed} 个")
+    config = store.strip(CONFIG_DATA.current())
+    config_store = CONFIG_STORE.get()
+    # 配置文件内容未变化时不重写，写入时只覆盖本次运行修改过的字段
+    if config == config_store.base:
         return False
+    return config_store.write(config) == config
+
+async def verify_accounts(session, cookies, warm_cache=None):
+    accounts = [Quark(cookie, index) for index, cookie in enumerate(cookies)]
+    logger.info("===============验证账号===============")
+    verify_tasks = [verify_account(session, account, warm_cache) for account in accounts]
+    await asyncio.gather(*verify_tasks)
+    return accounts
+
+async def open_accounts(session, cookies, config_path, warm_cache=None, previous=None):
+    # 验证账号，并为转存账号挂载已转存索引与本地镜像；常驻模式重新验证时沿用上次打开的索引与镜像
+    accounts = await verify_accounts(session, cookies, warm_cache)
+    old = previous[0] if previous else None
+    if old and old.saved_index:
+        accounts[0].saved_index = old.saved_index
+    else:
+        accounts[0].saved_index = SavedIndex(state_path(config_path, "saved.json"))
+        accounts[0].saved_index.load()
+    if CONFIG_DATA.get("mirror", True):
+        accounts[0].mirror = old.mirror if old and old.mirror else DriveMirror(state_path(config_path, "mirror.db"))
+    elif old and old.mirror:
+        old.mirror.close()
+    accounts[0].emby_cache = state_path(config_path, "emby.json")
+    accounts[0].recycle_ledger = RecycleLedger(state_path(config_path, "recycle.json"))
+    if warm_cache and warm_cache.data:
+        warm_cache.apply(accounts[0])
+    return accounts
+
+async def run_tasks(session, accounts, task_indexes=None, cookie_form_file=True, shards=1, journal=None, budget=None, pipeline=False, plan_only=False, force=False):
+    if plan_only:
+        # 仅生成计划，不签到、不执行任何写操作
+        tasklist = CONFIG_DATA.get("tasklist", [])
+        selected = [tasklist[i] for i in task_indexes or [] if 0 <= i < len(tasklist)]
+        if accounts[0].is_active and cookie_form_file:
+            stats = await do_save(session, accounts[0], selected or tasklist, force=bool(selected), plan_only=True)
+            print(json.dumps(stats["plans"], ensure_ascii=False, indent=2))
+        return
+    logger.info("===============签到任务===============")
+    for account in accounts:
+        # 每次运行重新获取容量与镜像有效目录，常驻模式下期间网盘可能有变动；刚预热过的保留预热结果
+        account.free_capacity = None
+        if not account.warmed:
+            account.stoken_cache.clear()
+            account.detail_cache.clear()
+            if account.mirror:
+                account.mirror.validated.clear()
+        account.warmed = False
+    sign_tasks = [do_sign(session, account) for account in accounts]
+    await asyncio.gather(*sign_tasks)
+    logger.info("===============转存任务===============")
+    if accounts[0].is_active and cookie_form_file:
+        tasklist = CONFIG_DATA.get("tasklist", [])
+        selected = [tasklist[i] for i in task_indexes or [] if 0 <= i < len(tasklist)]
+        pipeline = pipeline or CONFIG_DATA.get("pipeline", False)
+        if selected and force:
+            # 手动运行指定任务（force）时不受自适应轮询限制，直接执行
+            stats = await do_save(session, accounts[0], selected, force=True, pipeline=pipeline)
+        else:
+            # 全部任务，或按定时规则分组运行的任务：断点续跑、时间预算与分片同样生效
+            tasklist = selected or tasklist
+            if journal:
+                if journal.load():
+                    logger.info(f"♻️ 从中断的运行中恢复，已完成任务: {len(journal.done)} 个")
+                journal.begin()
+            deadline = None
+            if budget:
+                deadline = time.time() + budget
+                logger.info(f"⏳ 本次运行时间预算: {budget}s，按优先级执行任务")
+            if shards > 1 and len(tasklist) > 1:
+                logger.info(f"🧩 任务分为 {shards} 片并行执行")
+                stats = await do_save_sharded(session, accounts[0], tasklist, shards, journal, deadline, pipeline)
+            else:
+                stats = await do_save(session, accounts[0], tasklist, journal, deadline=deadline, pipeline=pipeline)
+        logger.info(f"📊 检查任务: {stats['checked']} 个，有更新: {stats['updated']} 个，顺延: {stats.get('carried', 0)} 个")
+        if stats["deferred"]:
+            # 空间不足的任务汇总为一条通知
+            deferred = stats["deferred"]
+            add_notify(
+                f"💾 网盘空间不足，{len(deferred)} 个任务共 {sum(d['count'] for d in deferred)} 个文件"
+                f"（{format_bytes(sum(d['size'] for d in deferred))}）未转存，已顺延到下次运行：\n"
+                + "\n".join(f"《{d['taskname']}》{d['count']} 个文件" for d in deferred)
+            )
+        if stats["duplicates"]:
+            duplicates = stats["duplicates"]
+            skipped = [d for d in duplicates if d["skipped"]]
+            message = f"♻️ 发现跨任务重复文件 {len(duplicates)} 个（{format_bytes(sum(d['size'] for d in duplicates))}）"
+            if skipped:
+                message += f"，已跳过 {len(skipped)} 个，节省空间 {format_bytes(sum(d['size'] for d in skipped))}"
+            add_notify(
+                message + "：\n" + "\n".join(f"《{d['taskname']}》{d['file_name']} → {d['saved_in']}" for d in duplicates)
+            )
+
+async def push_notifys(session=None):
+    logger.info("===============推送通知===============")
+    sink = NOTIFY_SINK.get()
+    if sink:
+        # 流式推送已在运行中发出，只推送剩余的消息；从中断运行中恢复的消息已推送过
+        NOTIFY_SINK.set(None)
+        await sink.close()
+        NOTIFYS.clear()
+    elif NOTIFYS:
+        # 按任务分段传入，超出渠道长度限制时在任务之间拆分
+        await send_ql_notify(NOTIFY_TITLE, NOTIFYS[:], session)
+        NOTIFYS.clear()
+
+async def run_daemon(config_path, shards=1, budget=None):
+    # 常驻模式：复用事件循环、连接池、账号及目录fid缓存，按配置的 crontab 自行调度
+    config_mtime = None
+    cookies = None
+    accounts = []
+    verify_time = 0
+    next_runs = None
+    next_run = None
+    warmed_run = None
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                mtime = os.path.getmtime(config_path)
+                if mtime != config_mtime:
+                    config_mtime = mtime
+                    logger.info(f"⚙️ 正从 {config_path} 文件中读取配置")
+                    load_config(config_path)
+                    next_runs = None
+            except Exception as e:
+                # 配置文件被删除或手动修改出错时沿用已读取的配置，文件再次修改后重新读取
+                logger.error(f"⚙️ 读取配置失败: {e}")
+            else:
+                if get_cookies(CONFIG_DATA.get("cookie")) != cookies:
+                    cookies = get_cookies(CONFIG_DATA.get("cookie"))
+                    verify_time = 0
+                    if not cookies:
+                        logger.error("❌ cookie 未配置")
+                        if accounts and accounts[0].mirror:
+                            accounts[0].mirror.close()
+                        accounts = []
+            if cookies and (not accounts or time.time() - verify_time > DAEMON_REVERIFY_INTERVAL):
+                # 定期重新验证账号并清空目录fid缓存，避免远端目录变动后缓存失效
+                accounts = await open_accounts(session, cookies, config_path, previous=accounts)
+                verify_time = time.time()
+            # 任务可单独设置 crontab，按定时规则分组调度，同一时刻到期的分组合并运行
+            groups = task_crontabs(CONFIG_DATA.get("tasklist", []), CONFIG_DATA.get("crontab") or DAEMON_CRONTAB)
+            if next_runs is None:
+                next_runs = {rule: next_fire_time(rule) for rule in groups}
+                next_runs = {rule: fire_time for rule, fire_time in next_runs.items() if fire_time}
+                next_run = min(next_runs.values(), default=None)
+                if next_run:
+                    logger.info(f"⏰ 下次运行: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+            if not next_run:
+                # 没有有效的定时规则，等待配置修改
+                await asyncio.sleep(60)
+                continue
+            due = [rule for rule, fire_time in next_runs.items() if fire_time == next_run]
+            task_indexes = sorted(index for rule in due for index in groups[rule])
+            warmup = int(CONFIG_DATA.get("warmup") or 0)
+            warm_time = next_run - timedelta(minutes=warmup)
+            if warmup and cookies and warmed_run != next_run and datetime.now() >= warm_time:
+                # 运行前预热：重新验证账号，预取到期任务的目录fid、分享 stoken 与分享列表
+                logger.info("===============运行预热===============")
+                warmed_run = next_run
+                try:
+                    accounts = await open_accounts(session, cookies, config_path, previous=accounts)
+                    verify_time = time.time()
+                    if accounts[0].is_active:
+                        tasklist = CONFIG_DATA.get("tasklist", [])
+                        await warm_up(session, accounts[0], [tasklist[i] for i in task_indexes])
+                except Exception as e:
+                    logger.error(f"预热异常: {e}")
+            if datetime.now() >= next_run:
+                start_time = datetime.now()
+                if not any(account.is_active for account in accounts):
+                    # 没有可用账号时跳过本次运行，等待下次定时或配置修改，不再反复唤醒
+                    logger.warning("⚠️ 没有可用的账号，跳过本次运行")
+                    # 推送验证账号时产生的消息（如登录失败）
+                    await push_notifys(session)
+                else:
+                    logger.info("===============开始运行===============")
+                    # 部分分组到期时只运行到期的任务，断点记录按分组区分；断点续跑、时间预算、分片同样生效
+                    if len(due) == len(groups):
+                        task_indexes = None
+                    tasklist = CONFIG_DATA.get("tasklist", [])
+                    task_keys = [task_key(tasklist[i]) for i in task_indexes or []]
+                    journal = Journal(journal_path(config_path, task_keys), CONFIG_DATA.get("checkpoint_window", CHECKPOINT_WINDOW))
+                    try:
+                        run_budget = budget or config_budget()
+                        open_notify_sink(session)
+                        await run_tasks(session, accounts, task_indexes, shards=shards, journal=journal, budget=run_budget)
+                        await push_notifys(session)
+                        if save_config(config_path):
+                            # 本次写入的配置与内存一致，无需重新读取；未写入或合并了 Web 端修改时按修改时间重新读取
+                            config_mtime = os.path.getmtime(config_path)
+                        accounts[0].saved_index.save()
+                        journal.finish()
+                    except Exception as e:
+                        logger.error(f"运行异常: {e}")
+                        NOTIFYS.clear()
+                    logger.info(f"😃 运行时长: {round((datetime.now() - start_time).total_seconds(), 2)}s")
+                for rule in due:
+                    next_runs[rule] = next_fire_time(rule)
+                    if not next_runs[rule]:
+                        del next_runs[rule]
+                next_run = min(next_runs.values(), default=None)
+                if next_run:
+                    logger.info(f"⏰ 下次运行: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+                else:
+                    continue
+            # 每分钟检查一次配置变动
+            wake_time = warm_time if warmup and warmed_run != next_run else next_run
+            await asyncio.sleep(max(1, min(60, (wake_time - datetime.now()).total_seconds())))
+
+async def run_config(session, config_path, cookies, cookie_form_file, args, task_indexes=[], force=False):
+    journal = None
+    warm_cache = None
+    if cookie_form_file and not (args.warmup or args.purge_recycle or args.plan_only):
+        warm_cache = WarmCache(state_path(config_path, "warmup.json"))
+        if warm_cache.load():
+            logger.info("🔥 使用运行前预热的缓存")
+    if cookie_form_file:
+        accounts = await open_accounts(session, cookies, config_path, warm_cache)
+    else:
+        accounts = await verify_accounts(session, cookies)
+    if args.warmup:
+        logger.info("===============运行预热===============")
+        if accounts[0].is_active and cookie_form_file:
+            tasklist = CONFIG_DATA.get("tasklist", [])
+            selected = [tasklist[i] for i in task_indexes if 0 <= i < len(tasklist)]
+            await warm_up(session, accounts[0], selected or tasklist)
+            ttl = int(CONFIG_DATA.get("warmup") or 5) * 60 + WARMUP_GRACE
+            WarmCache(state_path(config_path, "warmup.json")).save(accounts, ttl)
+        return
+    if not args.plan_only:
+        open_notify_sink(session)
+    if args.purge_recycle:
+        logger.info("===============清理回收站===============")
+        purge_all = args.purge_recycle == "all"
+        purge_tasks = [do_purge_recycle(session, account, purge_all) for account in accounts if account.is_active]
+        await asyncio.gather(*purge_tasks)
+    else:
+        if cookie_form_file and not force and not args.plan_only:
+            tasklist = CONFIG_DATA.get("tasklist", [])
+            task_keys = [task_key(tasklist[i]) for i in task_indexes if 0 <= i < len(tasklist)]
+            journal = Journal(journal_path(config_path, task_keys), CONFIG_DATA.get("checkpoint_window", CHECKPOINT_WINDOW))
+        budget = args.budget or config_budget()
+        await run_tasks(session, accounts, task_indexes, cookie_form_file, args.shards, journal, budget, args.pipeline, args.plan_only, force)
+    if args.plan_only:
+        return
+    await push_notifys(session)
+    if cookie_form_file:
+        save_config(config_path)
+        accounts[0].saved_index.save()
+        if journal:
+            journal.finish()
+        if warm_cache:
+            warm_cache.finish()
+
+async def run_configs(config_paths, args):
+    # 多个配置在同一进程中并发运行：共用连接池与分享缓存，配置、通知、日志前缀按上下文隔离，各自写回
+    SHARE_CACHE.set(ShareCache())
+
+    async def run_one(config_path):
+        CONFIG_DATA.bind({})
+        NOTIFYS.bind([])
+        RUN_LABEL.set(os.path.splitext(os.path.basename(config_path))[0])
+        if not os.path.exists(config_path):
+            logger.error(f"⚙️ 配置文件 {config_path} 不存在❌")
+            return
+        logger.info(f"⚙️ 正从 {config_path} 文件中读取配置")
+        load_config(config_path)
+        cookies = get_cookies(CONFIG_DATA.get("cookie"))
+        if not cookies:
+            logger.error("❌ cookie 未配置")
+            return
+        try:
+            await run_config(session, config_path, cookies, True, args)
+        except Exception as e:
+            logger.error(f"运行异常: {e}")
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*[run_one(config_path) for config_path in config_paths])
+
+def show_schedule(tasklist):
+    state_map = {"learning": "学习中", "release": "预期更新", "active": "活跃", "dormant": "休眠"}
+    for index, task in enumerate(tasklist):
+        schedule = poll_schedule(task)
+        next_poll = datetime.fromtimestamp(schedule["next_poll"]).strftime("%Y-%m-%d %H:%M")
+        logger.info(
+            f"#{index+1} 《{task['taskname']}》{state_map[schedule['state']]}，"
+            f"间隔: {round(schedule['interval'] / 3600, 1)}h，下次检查: {next_poll}，"
+            f"更新时段: {schedule['release_hours']}"
+        )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="夸克网盘自动追更")
+    parser.add_argument("config_path", nargs="?", default="quark_config.json", help="配置文件路径")
+    parser.add_argument("task_index", nargs="?", default="", help="仅运行指定序号的任务，多个以逗号分隔")
+    parser.add_argument("--task", action="append", default=[], metavar="KEY", help="仅运行指定的任务（任务名称|分享链接），可多次指定")
+    parser.add_argument("--force", action="store_true", help="指定的任务不受自适应轮询限制")
+    parser.add_argument(
+        "--purge-recycle",
+        nargs="?",
+        const="deleted",
+        choices=["deleted", "all"],
+        help="维护任务：清理本程序删除的文件在回收站中的记录，指定 all 时清空整个回收站",
+    )
+    parser.add_argument("--daemon", action="store_true", help="常驻运行，按配置的 crontab 定时执行")
+    parser.add_argument("--shards", type=int, default=1, help="将任务列表分片，由多个进程并行执行")
+    parser.add_argument("--schedule", action="store_true", help="查看各任务的自适应轮询计划")
+    parser.add_argument("--budget", type=parse_duration, help="本次运行时间预算，如 300s、10m，超时未执行的任务顺延到下次")
+    parser.add_argument("--pipeline", action="store_true", help="两阶段执行：先为全部任务生成计划，再分阶段批量执行")
+    parser.add_argument("--plan-only", action="store_true", help="仅输出执行计划（JSON），不做任何修改")
+    parser.add_argument("--configs", nargs="+", metavar="CONFIG", help="在同一进程中并发运行多个配置文件，共用连接池")
+    parser.add_argument("--warmup", action="store_true", help="运行前预热：验证账号，预取目录fid、分享 stoken 与分享列表供随后的运行使用")
+    return parser.parse_args(argv)
 
 async def main():
-    global CONFIG_DATA
     start_time = datetime.now()
     logger.info("===============程序开始===============")
     logger.info(f"⏰ 执行时间: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
 
-    config_path = sys.argv[1] if len(sys.argv) > 1 else "quark_config.json"
-    task_index = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else None
+    args = parse_args()
+    config_path = args.config_path
+    task_indexes = [int(i) for i in args.task_index.split(",") if i.strip().isdigit()]
+
+    if args.configs:
+        await run_configs(args.configs, args)
+        logger.info(f"😃 运行时长: {round((datetime.now() - start_time).total_seconds(), 2)}s")
+        return
+
+    if args.daemon:
+        if not os.path.exists(config_path):
+            logger.error(f"⚙️ 配置文件 {config_path} 不存在❌，常驻模式需要配置文件")
+            return
+        await run_daemon(config_path, args.shards, args.budget)
+        return
 
     if not os.path.exists(config_path):
         if os.environ.get("QUARK_COOKIE"):
@@ -843,44 +2674,38 @@ async def main():
             return
     else:
         logger.info(f"⚙️ 正从 {config_path} 文件中读取配置")
-        with open(config_path, "r", encoding="utf-8") as file:
-            CONFIG_DATA = json.load(file)
+        load_config(config_path)
         cookie_val = CONFIG_DATA.get("cookie")
-        if not CONFIG_DATA.get("magic_regex"):
-            CONFIG_DATA["magic_regex"] = MAGIC_REGEX
         cookie_form_file = True
 
+    if args.schedule:
+        show_schedule(CONFIG_DATA.get("tasklist", []))
+        return
+
+    # 手动运行单个任务时不受自适应轮询限制
+    force = args.force or (len(task_indexes) == 1 and not args.task)
+    if args.task and cookie_form_file:
+        # 按任务名称与分享链接选择，不受任务列表顺序变动影响
+        task_keys = set(args.task)
+        task_indexes = sorted(
+            set(task_indexes)
+            | {index for index, task in enumerate(CONFIG_DATA.get("tasklist", [])) if task_key(task) in task_keys}
+        )
+        if not task_indexes:
+            logger.info("指定的任务不存在或已被删除")
+            return
+
     cookies = get_cookies(cookie_val)
     if not cookies:
         logger.error("❌ cookie 未配置")
         return
 
     async with aiohttp.ClientSession() as session:
-        accounts = [Quark(cookie, index) for index, cookie in enumerate(cookies)]
-        logger.info("===============验证账号===============")
-        verify_tasks = [verify_account(session, account) for account in accounts]
-        await asyncio.gather(*verify_tasks)
-        logger.info("===============签到任务===============")
-        sign_tasks = [do_sign(session, account) for account in accounts]
-        await asyncio.gather(*sign_tasks)
-        logger.info("===============转存任务===============")
-        if accounts[0].is_active and cookie_form_file:
-            tasklist = CONFIG_DATA.get("tasklist", [])
-            if task_index is not None and 0 <= task_index < len(tasklist):
-                await do_save(session, accounts[0], [tasklist[task_index]])
-            else:
-                await do_save(session, accounts[0], tasklist)
-        logger.info("===============推送通知===============")
-        if NOTIFYS:
-            notify_body = "\n".join(NOTIFYS)
-            await send_ql_notify("【夸克自动追更】", notify_body)
-        if cookie_form_file:
-            with open(config_path, "w", encoding="utf-8") as file:
-                json.dump(CONFIG_DATA, file, ensure_ascii=False, indent=2)
+        await run_config(session, config_path, cookies, cookie_form_file, args, task_indexes, force)
     end_time = datetime.now()
     duration = end_time - start_time
     logger.info("===============程序结束===============")
     logger.info(f"😃 运行时长: {round(duration.total_seconds(), 2)}s")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
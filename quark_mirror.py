@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 目标目录树的本地 SQLite 镜像：路径查询、目录列表与文件名搜索在本地完成
+
+import os
+import json
+import time
+import sqlite3
+
+
+class DriveMirror:
+    # 目录列表只有在本次运行中从网盘获取过，或上级目录刚获取的列表显示其 updated_at 未变时才视为有效
+    def __init__(self, path):
+        self.path = path
+        self.validated = set()
+        self.connect()
+
+    def connect(self):
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                fid TEXT PRIMARY KEY,
+                pdir_fid TEXT,
+                file_name TEXT,
+                dir INTEGER,
+                size INTEGER,
+                updated_at INTEGER,
+                pos INTEGER,
+                info TEXT
+            );
+            CREATE INDEX IF NOT EXISTS files_pdir ON files (pdir_fid);
+            CREATE INDEX IF NOT EXISTS files_name ON files (file_name);
+            CREATE TABLE IF NOT EXISTS dirs (
+                fid TEXT PRIMARY KEY,
+                path TEXT,
+                updated_at INTEGER,
+                listed_at INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS dirs_path ON dirs (path);
+            """
+        )
+
+    # 分片子进程中重新打开数据库，保留本次运行的有效目录
+    def __getstate__(self):
+        return {"path": self.path, "validated": self.validated}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.validated = set(state["validated"])
+        self.connect()
+
+    def close(self):
+        self.db.close()
+
+    def get_fid(self, path):
+        # 目录可能已在网盘中被删除、重命名或重建，只返回本次运行中上级目录列表确认过的fid
+        if path == "/":
+            return "0"
+        parent = os.path.dirname(path.rstrip("/")) or "/"
+        rows = self.db.execute(
+            "SELECT d.fid, f.pdir_fid FROM dirs d JOIN files f ON f.fid = d.fid WHERE d.path = ?", (path,)
+        ).fetchall()
+        for fid, pdir_fid in rows:
+            if self.is_fresh(pdir_fid) and self.dir_path(pdir_fid) == parent:
+                return fid
+        return None
+
+    def dir_path(self, fid):
+        if str(fid) == "0":
+            return "/"
+        row = self.db.execute("SELECT path FROM dirs WHERE fid = ?", (fid,)).fetchone()
+        return row[0] if row else None
+
+    def put_dir(self, path, fid):
+        self.db.execute(
+            "INSERT INTO dirs (fid, path) VALUES (?, ?) ON CONFLICT(fid) DO UPDATE SET path = excluded.path",
+            (fid, path),
+        )
+        self.db.commit()
+
+    def has_listing(self, fid):
+        row = self.db.execute("SELECT listed_at FROM dirs WHERE fid = ?", (str(fid),)).fetchone()
+        return bool(row and row[0])
+
+    def is_fresh(self, fid):
+        return str(fid) in self.validated and self.has_listing(fid)
+
+    def listed_within(self, fid, ttl):
+        # 没有本次运行的校验结果时（如 WebUI 的单次浏览），只信任 ttl 秒内获取的列表
+        row = self.db.execute("SELECT listed_at FROM dirs WHERE fid = ?", (str(fid),)).fetchone()
+        return bool(row and row[0] and time.time() - row[0] <= ttl)
+
+    def listing(self, fid):
+        rows = self.db.execute(
+            "SELECT info FROM files WHERE pdir_fid = ? ORDER BY pos", (str(fid),)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def store_listing(self, fid, file_list):
+        fid = str(fid)
+        parent_path = self.dir_path(fid)
+        known = {
+            row[0]: row[1:]
+            for row in self.db.execute(
+                "SELECT d.fid, d.updated_at, d.listed_at FROM files f JOIN dirs d ON f.fid = d.fid WHERE f.pdir_fid = ?",
+                (fid,),
+            )
+        }
+        current = {item["fid"] for item in file_list}
+        for gone in set(known) - current:
+            self.db.execute("DELETE FROM dirs WHERE fid = ?", (gone,))
+            self.db.execute("DELETE FROM files WHERE pdir_fid = ?", (gone,))
+        self.db.execute("DELETE FROM files WHERE pdir_fid = ?", (fid,))
+        self.db.executemany(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    item["fid"],
+                    fid,
+                    item["file_name"],
+                    int(bool(item.get("dir"))),
+                    item.get("size", 0),
+                    item.get("updated_at", 0),
+                    pos,
+                    json.dumps(item, ensure_ascii=False),
+                )
+                for pos, item in enumerate(file_list)
+            ],
+        )
+        for item in file_list:
+            if not item.get("dir"):
+                continue
+            updated_at, listed_at = known.get(item["fid"], (None, None))
+            if listed_at and updated_at == item.get("updated_at"):
+                # 子目录自上次获取后未变动，本次运行可直接使用镜像中的列表
+                self.validated.add(item["fid"])
+            else:
+                listed_at = None
+            path = f"{parent_path.rstrip('/')}/{item['file_name']}" if parent_path else None
+            self.db.execute(
+                "INSERT INTO dirs VALUES (?, ?, ?, ?) ON CONFLICT(fid) DO UPDATE SET "
+                "path = COALESCE(excluded.path, path), updated_at = excluded.updated_at, listed_at = excluded.listed_at",
+                (item["fid"], path, item.get("updated_at", 0), listed_at),
+            )
+        self.db.execute(
+            "INSERT INTO dirs (fid, path, listed_at) VALUES (?, ?, ?) ON CONFLICT(fid) DO UPDATE SET listed_at = excluded.listed_at",
+            (fid, parent_path, int(time.time())),
+        )
+        self.db.commit()
+        self.validated.add(fid)
+
+    def invalidate(self, fid):
+        # 目录内容被本程序修改，下次列表时重新获取
+        self.validated.discard(str(fid))
+        self.db.execute("UPDATE dirs SET listed_at = NULL WHERE fid = ?", (str(fid),))
+        self.db.commit()
+
+    def rename(self, fid, file_name):
+        row = self.db.execute("SELECT info FROM files WHERE fid = ?", (fid,)).fetchone()
+        if not row:
+            return
+        info = json.loads(row[0])
+        info["file_name"] = file_name
+        self.db.execute(
+            "UPDATE files SET file_name = ?, info = ? WHERE fid = ?",
+            (file_name, json.dumps(info, ensure_ascii=False), fid),
+        )
+        old_path = self.dir_path(fid)
+        if old_path:
+            new_path = f"{os.path.dirname(old_path).rstrip('/')}/{file_name}"
+            self.db.execute(
+                "UPDATE dirs SET path = ? || substr(path, ?) WHERE path = ? OR path LIKE ?",
+                (new_path, len(old_path) + 1, old_path, f"{old_path}/%"),
+            )
+        self.db.commit()
+
+    def forget(self, path):
+        # 目录已不存在，删除其及子目录的记录
+        like = f"{path.rstrip('/')}/%"
+        fids = [row[0] for row in self.db.execute("SELECT fid FROM dirs WHERE path = ? OR path LIKE ?", (path, like))]
+        for fid in fids:
+            self.validated.discard(fid)
+        self.remove(fids)
+
+    def remove(self, fids):
+        for fid in fids:
+            self.db.execute("DELETE FROM files WHERE fid = ? OR pdir_fid = ?", (fid, fid))
+            self.db.execute("DELETE FROM dirs WHERE fid = ?", (fid,))
+        self.db.commit()
+
+    def search(self, keyword, limit=100):
+        rows = self.db.execute(
+            "SELECT f.info, d.path FROM files f LEFT JOIN dirs d ON f.pdir_fid = d.fid "
+            "WHERE f.file_name LIKE ? ESCAPE '\\' ORDER BY f.updated_at DESC LIMIT ?",
+            (
+                "%" + keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",
+                limit,
+            ),
+        ).fetchall()
+        return [{**json.loads(info), "path": path} for info, path in rows]
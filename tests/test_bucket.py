@@ -0,0 +1,38 @@
+from quark_auto_save import BUCKET_SIZE, bucket_name, parse_bucket
+
+
+def test_parse_bucket():
+    assert parse_bucket("season") == ("season", BUCKET_SIZE)
+    assert parse_bucket("year") == ("year", BUCKET_SIZE)
+    assert parse_bucket("count") == ("count", BUCKET_SIZE)
+    assert parse_bucket("count:50") == ("count", 50)
+
+
+def test_parse_bucket_rejects_invalid_policy():
+    for policy in ("count:abc", "count:0", "count:-5", "season:10", "month", "", None):
+        assert parse_bucket(policy) is None
+
+
+def test_bucket_by_season():
+    assert bucket_name("season", "Show.S02E05.mkv") == "S02"
+    assert bucket_name("season", "第3季 第05集.mp4") == "S03"
+    assert bucket_name("season", "Show.E05.mkv") is None
+
+
+def test_bucket_by_year():
+    assert bucket_name("year", "Movie.2023.1080p.mkv") == "2023"
+    assert bucket_name("year", "Movie.120230.mkv") is None
+
+
+def test_bucket_by_count():
+    assert bucket_name("count", "E001.mp4") == "001-100"
+    assert bucket_name("count", "EP100.mp4") == "001-100"
+    assert bucket_name("count", "第101集.mp4") == "101-200"
+    assert bucket_name("count:50", "0075.mp4") == "051-100"
+    # 0 集归入第一桶
+    assert bucket_name("count:50", "E0.mp4") == "001-050"
+
+
+def test_bucket_without_number_or_with_invalid_policy():
+    assert bucket_name("count", "trailer.mp4") is None
+    assert bucket_name("count:abc", "E001.mp4") is None
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import quark_auto_save
+from quark_auto_save import CONFIG_DATA, config_budget, do_save, order_tasks
+
+
+class FakeAccount:
+    nickname = "test"
+    mirror = None
+    emby_cache = None
+    saved_index = None
+
+    def __init__(self, on_plan=None):
+        self.planned = []
+        self.on_plan = on_plan
+
+    async def update_savepath_fid(self, session, tasklist):
+        pass
+
+    async def update_capacity(self, session):
+        pass
+
+    async def plan_task(self, session, task):
+        self.planned.append(task["taskname"])
+        if self.on_plan:
+            self.on_plan()
+        return None
+
+    async def execute_plans(self, session, plans):
+        return [None for _ in plans]
+
+
+def make_task(name, **kwargs):
+    return {
+        "taskname": name,
+        "shareurl": f"https://pan.quark.cn/s/{name}",
+        "savepath": f"/{name}",
+        "pattern": "",
+        "replace": "",
+        **kwargs,
+    }
+
+
+def test_expired_budget_carries_due_tasks():
+    CONFIG_DATA.bind({})
+    tasklist = [make_task("a"), make_task("b"), make_task("ended", enddate="2000-01-01")]
+    account = FakeAccount()
+    stats = asyncio.run(do_save(None, account, tasklist, deadline=time.time() - 1))
+    assert account.planned == []
+    assert stats["carried"] == 2
+    assert stats["checked"] == 0
+    assert [task.get("carried") for task in tasklist] == [True, True, None]
+
+
+def test_tasks_not_due_for_polling_are_not_carried():
+    now = time.time()
+    CONFIG_DATA.bind({"adaptive_poll": True})
+    # 长期未更新，下次检查在一周后
+    idle = make_task("idle", update_history=[now - 20 * 86400, now - 19 * 86400], last_poll=now)
+    due = make_task("due")
+    stats = asyncio.run(do_save(None, FakeAccount(), [idle, due], deadline=now - 1))
+    assert stats["carried"] == 1
+    assert "carried" not in idle
+    assert due["carried"] is True
+
+
+def test_pipeline_checks_budget_before_each_plan(monkeypatch):
+    CONFIG_DATA.bind({})
+    clock = [0]
+    monkeypatch.setattr(quark_auto_save.time, "time", lambda: clock[0])
+
+    def exhaust_budget():
+        clock[0] = 20
+
+    account = FakeAccount(on_plan=exhaust_budget)
+    tasklist = [make_task("a"), make_task("b"), make_task("c")]
+    stats = asyncio.run(do_save(None, account, tasklist, deadline=10, pipeline=True))
+    assert len(account.planned) == 1
+    assert stats["carried"] == 2
+    assert stats["checked"] == 1
+    assert sum(1 for task in tasklist if task.get("carried")) == 2
+
+
+def test_carried_tasks_run_first():
+    tasklist = [make_task("a"), make_task("b", carried=True), make_task("c")]
+    assert [index for index, _ in order_tasks(tasklist, prioritize=True)][0] == 1
+    assert [index for index, _ in order_tasks(tasklist)] == [0, 1, 2]
+
+
+def test_config_budget():
+    CONFIG_DATA.bind({"budget": "5m"})
+    assert config_budget() == 300
+    CONFIG_DATA.bind({"budget": "abc"})
+    assert config_budget() == 0
+    CONFIG_DATA.bind({})
+    assert config_budget() == 0
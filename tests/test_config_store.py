@@ -0,0 +1,104 @@
+import errno
+import json
+import os
+import stat
+
+import config_store
+from config_store import ConfigStore, merge
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def test_merge_keeps_changes_from_both_sides():
+    base = {"a": 1, "b": 1, "c": 1}
+    ours = {"a": 2, "b": 1, "c": 1}
+    theirs = {"a": 1, "b": 3, "c": 1, "d": 4}
+    assert merge(base, ours, theirs) == {"a": 2, "b": 3, "c": 1, "d": 4}
+
+
+def test_merge_conflict_prefers_ours():
+    assert merge({"a": 1}, {"a": 2}, {"a": 3}) == {"a": 2}
+
+
+def test_merge_deletions():
+    # 本方删除、对方未修改的字段被删除；对方删除、本方未修改的字段保持删除
+    assert merge({"a": 1, "b": 1}, {"b": 1}, {"a": 1, "b": 1}) == {"b": 1}
+    assert merge({"a": 1, "b": 1}, {"a": 1, "b": 1}, {"b": 1}) == {"b": 1}
+
+
+def test_merge_tasklist_by_taskname():
+    base = {"tasklist": [{"taskname": "a", "pattern": ""}, {"taskname": "b"}]}
+    ours = {"tasklist": [{"taskname": "a", "pattern": "mp4"}, {"taskname": "b"}]}
+    theirs = {"tasklist": [{"taskname": "b"}, {"taskname": "a", "pattern": ""}, {"taskname": "c"}]}
+    assert merge(base, ours, theirs) == {
+        "tasklist": [{"taskname": "b"}, {"taskname": "a", "pattern": "mp4"}, {"taskname": "c"}]
+    }
+
+
+def test_merge_tasklist_with_duplicate_names_prefers_ours():
+    base = {"tasklist": [{"taskname": "a"}]}
+    ours = {"tasklist": [{"taskname": "a"}, {"taskname": "a", "x": 1}]}
+    theirs = {"tasklist": [{"taskname": "a"}, {"taskname": "b"}]}
+    assert merge(base, ours, theirs) == ours
+
+
+def test_write_merges_concurrent_changes(tmp_path):
+    path = str(tmp_path / "quark_config.json")
+    write_json(path, {"crontab": "0 8 * * *", "tasklist": [{"taskname": "a"}]})
+    store = ConfigStore(path)
+    data = store.read()
+    # 其他进程（如 Web 端）在读取后修改了配置
+    write_json(path, {"crontab": "0 9 * * *", "tasklist": [{"taskname": "a"}, {"taskname": "b"}]})
+    data["tasklist"][0]["pattern"] = "mp4"
+    written = store.write(data)
+    expected = {"crontab": "0 9 * * *", "tasklist": [{"taskname": "a", "pattern": "mp4"}, {"taskname": "b"}]}
+    assert written == expected
+    assert read_json(path) == expected
+    assert store.base == expected
+
+
+def test_write_replaces_file_atomically(tmp_path):
+    path = str(tmp_path / "quark_config.json")
+    write_json(path, {"a": 1})
+    os.chmod(path, 0o600)
+    inode = os.stat(path).st_ino
+    store = ConfigStore(path)
+    store.write({**store.read(), "a": 2})
+    assert read_json(path) == {"a": 2}
+    assert os.stat(path).st_ino != inode
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_write_in_place_when_replace_is_not_possible(tmp_path, monkeypatch):
+    path = str(tmp_path / "quark_config.json")
+    write_json(path, {"a": 1})
+
+    def busy(src, dst):
+        raise OSError(errno.EBUSY, "Device or resource busy")
+
+    monkeypatch.setattr(config_store.os, "replace", busy)
+    store = ConfigStore(path)
+    store.write({**store.read(), "a": 2})
+    assert read_json(path) == {"a": 2}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_transaction_skips_unchanged_write(tmp_path):
+    path = str(tmp_path / "quark_config.json")
+    write_json(path, {"tasklist": []})
+    inode = os.stat(path).st_ino
+    with ConfigStore(path).transaction() as data:
+        pass
+    assert os.stat(path).st_ino == inode
+    with ConfigStore(path).transaction() as data:
+        data["tasklist"].append({"taskname": "a"})
+    assert read_json(path) == {"tasklist": [{"taskname": "a"}]}
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytest
+
+from quark_auto_save import crontab_next, next_fire_time, parse_cron_field, task_crontabs
+
+
+def test_parse_cron_field():
+    assert parse_cron_field("*", 0, 5) == {0, 1, 2, 3, 4, 5}
+    assert parse_cron_field("8,18,20", 0, 23) == {8, 18, 20}
+    assert parse_cron_field("1-3", 0, 23) == {1, 2, 3}
+    assert parse_cron_field("*/15", 0, 59) == {0, 15, 30, 45}
+    assert parse_cron_field("10-20/5", 0, 59) == {10, 15, 20}
+    # 起始值带步长时一直取到上限
+    assert parse_cron_field("5/20", 0, 59) == {5, 25, 45}
+
+
+def test_crontab_next_same_day():
+    after = datetime(2024, 5, 1, 9, 30, 45)
+    assert crontab_next("0 8,18,20 * * *", after) == datetime(2024, 5, 1, 18, 0)
+
+
+def test_crontab_next_is_strictly_after():
+    after = datetime(2024, 5, 1, 18, 0, 30)
+    assert crontab_next("0 8,18,20 * * *", after) == datetime(2024, 5, 1, 20, 0)
+    assert crontab_next("0 8,18,20 * * *", datetime(2024, 5, 1, 20, 0)) == datetime(2024, 5, 2, 8, 0)
+
+
+def test_crontab_next_month_and_year_rollover():
+    assert crontab_next("30 2 1 * *", datetime(2024, 5, 15)) == datetime(2024, 6, 1, 2, 30)
+    assert crontab_next("0 0 1 1 *", datetime(2024, 5, 15)) == datetime(2025, 1, 1, 0, 0)
+
+
+def test_crontab_next_weekday():
+    # 2024-05-01 为周三；0 与 7 都表示周日
+    assert crontab_next("0 9 * * 1", datetime(2024, 5, 1)) == datetime(2024, 5, 6, 9, 0)
+    assert crontab_next("0 9 * * 0", datetime(2024, 5, 1)) == datetime(2024, 5, 5, 9, 0)
+    assert crontab_next("0 9 * * 7", datetime(2024, 5, 1)) == datetime(2024, 5, 5, 9, 0)
+
+
+def test_crontab_next_day_or_weekday():
+    # 日与周都指定时满足其一即可
+    assert crontab_next("0 9 10 * 5", datetime(2024, 5, 1)) == datetime(2024, 5, 3, 9, 0)
+
+
+def test_crontab_next_impossible_date():
+    assert crontab_next("0 0 31 2 *", datetime(2024, 1, 1)) is None
+
+
+def test_month_and_weekday_names():
+    assert parse_cron_field("mon-fri", 0, 7, {"mon": 1, "fri": 5}) == {1, 2, 3, 4, 5}
+    # 2024-05-04 为周六
+    assert crontab_next("0 20 * * mon-fri", datetime(2024, 5, 4)) == datetime(2024, 5, 6, 20, 0)
+    assert crontab_next("0 20 * * SAT,sun", datetime(2024, 5, 1)) == datetime(2024, 5, 4, 20, 0)
+    assert crontab_next("0 0 1 jun ?", datetime(2024, 5, 1)) == datetime(2024, 6, 1, 0, 0)
+
+
+@pytest.mark.parametrize("crontab", ["0 24 * * *", "0 8 * * funday", "*/0 * * * *", "0 8 * *", "5-1 * * * *"])
+def test_invalid_crontab(crontab):
+    with pytest.raises(ValueError):
+        crontab_next(crontab, datetime(2024, 5, 1))
+
+
+def test_next_fire_time_skips_bad_rules():
+    assert next_fire_time("0 8 30 2 *") is None
+    assert next_fire_time("0 8 * * funday") is None
+    assert next_fire_time(None) is None
+    assert next_fire_time("0 8 * * *") is not None
+
+
+def test_task_crontabs_groups_by_task_rule():
+    tasklist = [{"taskname": "a"}, {"taskname": "b", "crontab": "0 3 * * *"}, {"taskname": "c"}]
+    assert task_crontabs(tasklist, "0 8 * * *") == {"0 8 * * *": [0, 2], "0 3 * * *": [1]}
+
+
+def test_task_crontabs_without_tasks():
+    assert task_crontabs([], "0 8 * * *") == {"0 8 * * *": []}
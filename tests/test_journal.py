@@ -0,0 +1,40 @@
+import json
+import os
+import time
+
+from quark_auto_save import Journal, task_key
+
+
+def write_lines(path, lines, tail=""):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("".join(json.dumps(line) + "\n" for line in lines) + tail)
+
+
+def test_expired_journal_with_torn_line_is_removed(tmp_path):
+    path = str(tmp_path / "quark_config.journal")
+    write_lines(path, [{"begin": 1}], tail='{"key": "a|u", "sta')
+    assert Journal(path).load() is False
+    assert not os.path.exists(path)
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    path = str(tmp_path / "quark_config.journal")
+    task = {"taskname": "a", "shareurl": "u"}
+    record = {"key": task_key(task), "state": {"last_poll": 5}, "notifys": ["saved"]}
+    write_lines(path, [{"begin": time.time()}, record], tail='{"key": "b|u", "sta')
+    journal = Journal(path)
+    assert journal.load() is True
+    assert list(journal.done) == ["a|u"]
+    # 截掉不完整的行后继续追加，之后的记录仍可读取
+    journal.checkpoint({"taskname": "b", "shareurl": "u"}, [])
+    reloaded = Journal(path)
+    assert reloaded.load() is True
+    assert sorted(reloaded.done) == ["a|u", "b|u"]
+
+
+def test_unreadable_journal_is_removed(tmp_path):
+    path = str(tmp_path / "quark_config.journal")
+    with open(path, "wb") as file:
+        file.write(b"\xff\xfe garbage\n")
+    assert Journal(path).load() is False
+    assert not os.path.exists(path)
@@ -0,0 +1,16 @@
+import time
+
+from quark_mirror import DriveMirror
+
+
+def test_listed_within(tmp_path):
+    mirror = DriveMirror(str(tmp_path / "quark_config.mirror.db"))
+    try:
+        assert not mirror.listed_within("p", 60)
+        mirror.store_listing("p", [{"fid": "a", "file_name": "a.mkv"}])
+        assert mirror.listed_within("p", 60)
+        mirror.db.execute("UPDATE dirs SET listed_at = ? WHERE fid = 'p'", (int(time.time()) - 120,))
+        assert not mirror.listed_within("p", 60)
+        assert mirror.has_listing("p")
+    finally:
+        mirror.close()
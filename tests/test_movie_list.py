@@ -0,0 +1,97 @@
+import json
+
+import movie_list
+from movie_list import LinksTail, import_movies, run_tasks
+
+
+def line(name, savepath=None):
+    return f"{name}=https://pan.quark.cn/s/{name}={savepath or '/' + name}\n"
+
+
+def names(movies):
+    return [movie['taskname'] for movie in movies]
+
+
+def test_append_reads_only_new_lines(tmp_path):
+    path = tmp_path / "movie_links.txt"
+    path.write_text(line("a") + line("b"), encoding="utf-8")
+    tail = LinksTail(str(path))
+    assert names(tail.scan()) == ["a", "b"]
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(line("c"))
+    assert names(tail.read_new()) == ["c"]
+    assert tail.read_new() == []
+
+
+def test_incomplete_line_waits_for_newline(tmp_path):
+    path = tmp_path / "movie_links.txt"
+    path.write_text(line("a"), encoding="utf-8")
+    tail = LinksTail(str(path))
+    tail.scan()
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(line("b").rstrip("\n"))
+    assert tail.read_new() == []
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("\n")
+    assert names(tail.read_new()) == ["b"]
+
+
+def test_rewrite_returns_changed_lines(tmp_path):
+    path = tmp_path / "movie_links.txt"
+    path.write_text(line("a") + line("b") + line("c"), encoding="utf-8")
+    tail = LinksTail(str(path))
+    tail.scan()
+    # 编辑器改写了中间一行
+    path.write_text(line("a") + line("b", "/new") + line("c"), encoding="utf-8")
+    changed = tail.read_new()
+    assert names(changed) == ["b"]
+    assert changed[0]['savepath'] == "/new"
+    # 改写后继续追加
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(line("d"))
+    assert names(tail.read_new()) == ["d"]
+
+
+def test_gbk_file(tmp_path):
+    path = tmp_path / "movie_links.txt"
+    path.write_bytes(line("如龙").encode("gbk"))
+    tail = LinksTail(str(path))
+    assert names(tail.scan()) == ["如龙"]
+    assert tail.encoding == "gbk"
+
+
+def test_missing_file_is_read_once_created(tmp_path):
+    path = tmp_path / "movie_links.txt"
+    tail = LinksTail(str(path))
+    path.write_text(line("a"), encoding="utf-8")
+    assert names(tail.read_new()) == ["a"]
+
+
+def test_import_runs_tasks_by_key(tmp_path, monkeypatch):
+    config_path = tmp_path / "quark_config.json"
+    config_path.write_text(json.dumps({"tasklist": [{"taskname": "old", "shareurl": "u", "savepath": "/old"}]}))
+    movies = [movie_list.parse_movie_line(line("a")), movie_list.parse_movie_line(line("old", "/moved"))]
+    stats, task_keys = import_movies(str(config_path), movies)
+    assert (stats['added'], stats['updated']) == (1, 1)
+    assert task_keys == ["a|https://pan.quark.cn/s/a", "old|https://pan.quark.cn/s/old"]
+
+    commands = []
+    monkeypatch.setattr(movie_list.subprocess, "run", commands.append)
+    run_tasks(str(config_path), task_keys)
+    assert commands[0][2:] == [
+        str(config_path),
+        "--force",
+        "--task=a|https://pan.quark.cn/s/a",
+        "--task=old|https://pan.quark.cn/s/old",
+    ]
+
+
+def test_lines_sharing_a_url_stay_separate_tasks():
+    config = {"tasklist": []}
+    movies = [movie_list.parse_movie_line("A=u1=/a"), movie_list.parse_movie_line("B=u1=/b")]
+    stats = movie_list.update_json_config(config, movies)
+    assert [task['taskname'] for task in config['tasklist']] == ["A", "B"]
+    assert stats['added'] == 2
+    # 再次导入相同内容没有变化，不重写配置
+    stats = movie_list.update_json_config(config, movies)
+    assert (stats['added'], stats['updated'], stats['unchanged']) == (0, 0, 2)
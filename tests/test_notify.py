@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import notify
+from notify import chunk_sections
+
+
+def test_sections_that_fit_stay_in_one_message():
+    assert chunk_sections(["a", "b", "c"], 100) == ["a\nb\nc"]
+
+
+def test_split_between_sections():
+    sections = ["a" * 6, "b" * 6, "c" * 6]
+    chunks = chunk_sections(sections, 13)
+    assert chunks == ["aaaaaa\nbbbbbb", "cccccc"]
+    assert "\n".join(chunks) == "\n".join(sections)
+
+
+def test_long_section_split_by_line():
+    section = "\n".join(["x" * 4] * 5)
+    chunks = chunk_sections(["head", section], 10)
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert "\n".join(chunks) == "head\n" + section
+
+
+def test_long_line_is_cut():
+    chunks = chunk_sections(["y" * 25], 10)
+    assert chunks == ["y" * 10, "y" * 10, "y" * 5]
+
+
+def test_size_in_bytes():
+    # 汉字按 UTF-8 计为 3 字节
+    chunks = chunk_sections(["转存" * 5], 12, use_bytes=True)
+    assert all(len(chunk.encode("utf-8")) <= 12 for chunk in chunks)
+    assert "".join(chunks) == "转存" * 5
+    assert chunk_sections(["转存" * 5], 12) == ["转存" * 5]
+
+
+def test_empty_sections():
+    assert chunk_sections([], 10) == []
+
+
+class FakeResponse:
+    def __init__(self, status, text):
+        self.status = status
+        self._text = text
+
+    async def text(self):
+        return self._text
+
+    async def json(self, content_type=None):
+        return {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeSession:
+    def __init__(self, status=200, text="success"):
+        self.requests = []
+        self.status = status
+        self.text = text
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url))
+        return FakeResponse(self.status, self.text)
+
+
+def slow_channel(title, content):
+    pass
+
+
+def test_thread_channel_timeout_does_not_block_exit_or_retry(monkeypatch):
+    calls = []
+
+    def send(title, content):
+        calls.append(title)
+        time.sleep(3)
+
+    monkeypatch.setitem(notify.THREAD_SENDERS, slow_channel, send)
+    start = time.time()
+    result = asyncio.run(notify.send_channel(FakeSession(), slow_channel, "t", ["c"], 0.2))
+    assert time.time() - start < 1.5
+    assert result["ok"] is False
+    assert result["error"] == "超时"
+    assert calls == ["t"]
+
+
+def test_thread_channel_failure_is_reported(monkeypatch):
+    def send(title, content):
+        raise RuntimeError("login failed")
+
+    monkeypatch.setitem(notify.THREAD_SENDERS, slow_channel, send)
+    monkeypatch.setattr(notify, "NOTIFY_RETRIES", 0)
+    result = asyncio.run(notify.send_channel(FakeSession(), slow_channel, "t", ["c"], 1))
+    assert result["ok"] is False
+    assert result["error"] == "login failed"
+
+
+def test_request_channels_send_every_request_and_check_response(monkeypatch):
+    monkeypatch.setattr(notify, "NOTIFY_RETRIES", 0)
+    notify.push_config.bind(
+        {"CHRONOCAT_URL": "http://chronocat", "CHRONOCAT_QQ": "user_id=1;group_id=2", "CHRONOCAT_TOKEN": "x"}
+    )
+    session = FakeSession()
+    result = asyncio.run(notify.send_channel(session, notify.chronocat, "t", ["c"], 1))
+    assert result["ok"] is True
+    assert len(session.requests) == 2
+
+    notify.push_config.bind({"PUSHME_KEY": "k"})
+    result = asyncio.run(notify.send_channel(FakeSession(text="error"), notify.pushme, "t", ["c"], 1))
+    assert result["ok"] is False
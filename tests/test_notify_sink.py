@@ -0,0 +1,25 @@
+import asyncio
+
+import quark_auto_save
+from quark_auto_save import CONFIG_DATA, NOTIFYS, add_notify, open_notify_sink, push_notifys
+
+
+def test_stream_sends_messages_queued_before_the_sink(monkeypatch):
+    sent = []
+
+    async def send(title, body, session=None):
+        sent.extend(body)
+
+    monkeypatch.setattr(quark_auto_save, "send_ql_notify", send)
+
+    async def run():
+        NOTIFYS.clear()
+        add_notify("login failed")
+        open_notify_sink(None)
+        add_notify("task saved")
+        await push_notifys()
+
+    CONFIG_DATA.bind({"notify_stream": 5})
+    asyncio.run(run())
+    assert sent == ["login failed", "task saved"]
+    assert list(NOTIFYS) == []
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from quark_auto_save import POLL_MAX_INTERVAL, POLL_MIN_INTERVAL, is_poll_due, poll_schedule, record_poll
+
+
+def daily(start, days, hour=20):
+    return [int((start + timedelta(days=i)).replace(hour=hour).timestamp()) for i in range(days)]
+
+
+START = datetime(2024, 5, 1)
+
+
+def test_learning_until_two_updates():
+    task = {"last_poll": 1000, "update_history": [500]}
+    schedule = poll_schedule(task, now=2000)
+    assert schedule["state"] == "learning"
+    assert schedule["next_poll"] == 1000
+    assert is_poll_due(task, now=2000)
+
+
+def test_release_window_checks_every_run():
+    now = datetime(2024, 5, 6, 20, 30).timestamp()
+    task = {"update_history": daily(START, 5), "last_poll": now - 60}
+    schedule = poll_schedule(task, now)
+    assert schedule["state"] == "release"
+    assert schedule["interval"] == 0
+    assert schedule["release_hours"] == [20]
+    assert is_poll_due(task, now)
+
+
+def test_active_polls_at_quarter_of_update_gap():
+    now = datetime(2024, 5, 6, 8, 0).timestamp()
+    task = {"update_history": daily(START, 5), "last_poll": now - 3600}
+    schedule = poll_schedule(task, now)
+    assert schedule["state"] == "active"
+    assert schedule["interval"] == 86400 // 4
+    assert not is_poll_due(task, now)
+    task["last_poll"] = now - 86400 // 4
+    assert is_poll_due(task, now)
+
+
+def test_short_gaps_use_minimum_interval():
+    history = [int(START.timestamp()) + i * 60 for i in range(5)]
+    now = START.timestamp() + 3 * 3600
+    schedule = poll_schedule({"update_history": history, "last_poll": now}, now)
+    assert schedule["state"] == "active"
+    assert schedule["interval"] == POLL_MIN_INTERVAL
+
+
+def test_dormant_after_long_silence():
+    now = datetime(2024, 5, 20, 8, 0).timestamp()
+    task = {"update_history": daily(START, 5), "last_poll": now}
+    schedule = poll_schedule(task, now)
+    assert schedule["state"] == "dormant"
+    assert schedule["next_poll"] == now + POLL_MAX_INTERVAL
+
+
+def test_record_poll_keeps_history_of_updates_only():
+    task = {}
+    record_poll(task, False, now=100)
+    assert task == {"last_poll": 100}
+    record_poll(task, True, now=200)
+    assert task == {"last_poll": 200, "update_history": [200]}
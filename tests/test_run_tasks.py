@@ -0,0 +1,63 @@
+import asyncio
+
+import quark_auto_save
+from quark_auto_save import CONFIG_DATA, Journal, journal_path, run_tasks
+
+
+class FakeAccount:
+    is_active = True
+    warmed = False
+    mirror = None
+    free_capacity = None
+
+    def __init__(self):
+        self.stoken_cache = {}
+        self.detail_cache = {}
+
+
+def capture_do_save(monkeypatch):
+    calls = []
+
+    async def do_sign(session, account):
+        pass
+
+    async def do_save(session, account, tasklist, journal=None, **kwargs):
+        calls.append({"tasklist": tasklist, "journal": journal, **kwargs})
+        return {"checked": len(tasklist), "updated": 0, "carried": 0, "deferred": [], "duplicates": []}
+
+    monkeypatch.setattr(quark_auto_save, "do_sign", do_sign)
+    monkeypatch.setattr(quark_auto_save, "do_save", do_save)
+    return calls
+
+
+TASKLIST = [
+    {"taskname": "a", "shareurl": "u1"},
+    {"taskname": "b", "shareurl": "u2", "crontab": "0 3 * * *"},
+]
+
+
+def test_scheduled_group_keeps_journal_and_budget(monkeypatch, tmp_path):
+    calls = capture_do_save(monkeypatch)
+    CONFIG_DATA.bind({"tasklist": TASKLIST})
+    journal = Journal(str(tmp_path / "quark_config.journal"))
+    asyncio.run(run_tasks(None, [FakeAccount()], [1], journal=journal, budget=60))
+    assert calls[0]["tasklist"] == [TASKLIST[1]]
+    assert calls[0]["journal"] is journal
+    assert calls[0]["deadline"] is not None
+
+
+def test_manual_run_is_direct(monkeypatch):
+    calls = capture_do_save(monkeypatch)
+    CONFIG_DATA.bind({"tasklist": TASKLIST})
+    asyncio.run(run_tasks(None, [FakeAccount()], [0], budget=60, force=True))
+    assert calls[0]["tasklist"] == [TASKLIST[0]]
+    assert calls[0]["force"] is True
+    assert "deadline" not in calls[0]
+
+
+def test_journal_path_per_group():
+    assert journal_path("/c/quark_config.json") == "/c/quark_config.journal"
+    group = journal_path("/c/quark_config.json", ["b|u2", "a|u1"])
+    assert group == journal_path("/c/quark_config.json", ["a|u1", "b|u2"])
+    assert group != journal_path("/c/quark_config.json", ["a|u1"])
+    assert group.endswith(".journal")